@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+import random
+import time
+
+from quiz import QuizGame, Question, START_SECONDS
+from replay import MODE_GAME, MODE_REVIEW, SessionRecorder, session_record
+from review import REVIEW_CATEGORY
+from user import UserProfile
+
+
+@dataclass
+class Turn:
+    """Состояние игры после события: следующий вопрос или итог."""
+    question: Optional[Question]
+    remaining: int
+    score: int
+    timer_sec: int = START_SECONDS
+    last_correct: Optional[bool] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.question is None
+
+
+class GameController:
+    """Ход игры без привязки к интерфейсу.
+
+    События: start → (answer | timeout)* → finish. Каждое событие возвращает Turn;
+    если передан view (например, QuizUI), контроллер сам вызывает
+    view.show_question / view.show_result. Без view работает без Tk.
+    С recorder (replay.SessionRecorder) вопросы выбираются от записываемого seed,
+    а каждая завершённая игра попадает в журнал для воспроизведения.
+    """
+
+    def __init__(self, game: QuizGame, profile: UserProfile, user_id: int,
+                 view: Optional[Any] = None, questions_count: int = 10,
+                 recorder: Optional[SessionRecorder] = None):
+        self.game = game
+        self.profile = profile
+        self.user_id = user_id
+        self.view = view
+        self.questions_count = questions_count
+        self.category: Optional[str] = None
+        self.duration_sec = 0
+        self.finished = True
+        self.recorder = recorder
+        self._mode = MODE_GAME
+        self._seed: Optional[int] = None
+        self._started_ts = 0
+
+    def start(self, category: str) -> Turn:
+        self._seed = self.recorder.new_seed() if self.recorder is not None else None
+        rng = random.Random(self._seed) if self._seed is not None else None
+        self.game.start_game(category, self.questions_count, self.user_id, rng)
+        self._begin(MODE_GAME, category)
+        return self._advance()
+
+    def start_review(self) -> Turn:
+        """Начать повторение ошибок. Если повторять нечего — сразу итоговый Turn без сохранения."""
+        self.game.start_review(self.user_id, self.questions_count)
+        if not self.game.questions:
+            return Turn(None, 0, 0)
+        self._seed = None
+        self._begin(MODE_REVIEW, REVIEW_CATEGORY)
+        return self._advance()
+
+    def _begin(self, mode: str, category: str) -> None:
+        self._mode = mode
+        self._started_ts = int(time.time())
+        self.category = category
+        self.duration_sec = 0
+        self.finished = False
+
+    def answer(self, question_id: int, selected_index: int, time_spent_sec: int) -> Turn:
+        is_correct = self.game.check_answer(question_id, selected_index, time_spent_sec)
+        self.duration_sec += time_spent_sec
+        return self._advance(is_correct)
+
+    def timeout(self, question_id: int, time_spent_sec: int) -> Turn:
+        # Время вышло — считаем как неправильный ответ
+        self.game.record_timeout(question_id, time_spent_sec)
+        self.duration_sec += time_spent_sec
+        return self._advance(False)
+
+    def finish(self) -> Turn:
+        """Завершить игру и сохранить результат (повторный вызов ничего не пишет)."""
+        if not self.finished:
+            self.finished = True
+            self.profile.save_result(self.user_id, self.game.get_score(), self.duration_sec,
+                                     self.category or "unknown", self.game.answers)
+            if self.recorder is not None:
+                self.recorder.write(session_record(
+                    self.game, self.user_id, self._mode, self.category or "unknown", self._seed,
+                    self._started_ts, self.questions_count, [question.id for question in self.game.questions],
+                    self.duration_sec))
+        turn = Turn(None, 0, self.game.get_score())
+        if self.view is not None:
+            self.view.show_result(turn.score)
+        return turn
+
+    def _advance(self, last_correct: Optional[bool] = None) -> Turn:
+        """Следующий вопрос или сохранение результата — единая точка для всех событий."""
+        question = self.game.get_next_question()
+        if question is None:
+            turn = self.finish()
+            turn.last_correct = last_correct
+            return turn
+
+        remaining = self.game.get_remaining() + 1  # включаем текущий
+        turn = Turn(question, remaining, self.game.get_score(), last_correct=last_correct)
+        if self.view is not None:
+            self.view.show_question(question, turn.remaining, turn.score, turn.timer_sec)
+        return turn
+
+
+def play_scripted_game(controller: GameController, category: str, accuracy: float,
+                       rng: random.Random) -> Turn:
+    """Сыграть одну игру ботом: верный ответ с вероятностью accuracy, случайное время."""
+    turn = controller.start(category)
+    while not turn.finished:
+        question = turn.question
+        time_spent = rng.randint(1, START_SECONDS)
+        if time_spent >= START_SECONDS:
+            turn = controller.timeout(question.id, time_spent)
+        elif rng.random() < accuracy:
+            turn = controller.answer(question.id, question.correct_index, time_spent)
+        else:
+            wrong = (question.correct_index + rng.randint(1, len(question.options) - 1)) % len(question.options)
+            turn = controller.answer(question.id, wrong, time_spent)
+    return turn
@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+import atexit
+import sqlite3
+import threading
+
+# Прагмы для каждого нового соединения. journal_mode=WAL сохраняется в файле базы:
+# читатели не блокируют писателя, а synchronous=NORMAL в WAL не делает fsync на каждый commit.
+DEFAULT_PRAGMAS: Tuple[Tuple[str, object], ...] = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),  # 16 МБ страничного кэша
+    ("temp_store", "MEMORY"),
+    ("foreign_keys", "ON"),
+    ("busy_timeout", 5000),
+)
+
+# played_ts хранится в секундах UTC; сводки по дням и очередь повторения считают в днях
+SECONDS_PER_DAY = 86400
+
+T = TypeVar("T")
+
+# Размер кэша подготовленных выражений sqlite3 (ключ — текст SQL) на соединение
+CACHED_STATEMENTS = 256
+
+
+class ConnectionManager:
+    """Постоянные соединения с одной базой: по одному на поток.
+
+    Соединение открывается при первом обращении из потока, настраивается
+    прагмами один раз и дальше переиспользуется вместе с кэшем выражений.
+    close_all() закрывает все соединения (вызывается и при выходе из процесса);
+    соединения потоков и DedicatedConnection после этого открываются заново.
+    """
+
+    def __init__(self, db_path: Path, pragmas: Tuple[Tuple[str, object], ...] = DEFAULT_PRAGMAS):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        # После close_all() потоки откроют новые соединения, а не возьмут закрытые
+        self._generation = 0
+
+    def open(self) -> sqlite3.Connection:
+        """Новое настроенное соединение, закрываемое вместе с менеджером.
+
+        check_same_thread=False: соединение может закрыть close_all() из другого
+        потока, а владельцы выделенных соединений сами защищают их блокировкой.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока."""
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            local.conn = self.open()
+            local.generation = self._generation
+        return local.conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Соединение текущего потока с commit при успехе и rollback при ошибке."""
+        conn = self.connection()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def close_all(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+def db_key(path: Path) -> str:
+    """Ключ файла в общих реестрах процесса: один объект на файл, как бы ни был записан путь."""
+    return str(Path(path).resolve())
+
+
+class SharedRegistry(Generic[T]):
+    """Общие для процесса объекты по файлу (база, пакет): создаются factory(path) при первом get()."""
+
+    def __init__(self, factory: Callable[[Path], T]):
+        self._factory = factory
+        self._items: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> T:
+        key = db_key(path)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = self._factory(path)
+            return item
+
+    def peek(self, path: Path) -> Optional[T]:
+        """Объект файла, если он уже создан (без создания)."""
+        return self._items.get(db_key(path))
+
+    def values(self) -> List[T]:
+        with self._lock:
+            return list(self._items.values())
+
+
+_managers: SharedRegistry[ConnectionManager] = SharedRegistry(ConnectionManager)
+
+
+def get_manager(db_path: Path) -> ConnectionManager:
+    """Общий ConnectionManager для файла базы."""
+    return _managers.get(db_path)
+
+
+class DedicatedConnection:
+    """Собственное соединение менеджера для долгоживущего владельца (кэш, селектор).
+
+    В отличие от connection(), не привязано к потоку: владелец защищает его
+    своей блокировкой. После close_all() при следующем обращении открывается заново.
+    """
+
+    def __init__(self, db_path: Path):
+        self._manager = get_manager(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._generation: Optional[int] = None
+
+    def get(self) -> sqlite3.Connection:
+        generation = self._manager._generation
+        if self._conn is None or generation != self._generation:
+            self._conn = self._manager.open()
+            self._generation = generation
+        return self._conn
+
+    def data_version(self) -> Tuple[int, int]:
+        """PRAGMA data_version вместе с поколением соединения: у нового соединения отсчёт свой."""
+        conn = self.get()
+        return self._generation, conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class VersionCounter:
+    """Проверка счётчика версии (таблица из одной строки id = 1, например bank_version).
+
+    changed() сначала сравнивает PRAGMA data_version собственного соединения —
+    бесплатно, без чтения страниц — и читает счётчик, только если базу меняло
+    другое соединение. Вызывать под блокировкой владельца.
+    """
+
+    def __init__(self, db_path: Path, table: str = "bank_version"):
+        self.table = table
+        self._db = DedicatedConnection(db_path)
+        self._data_version: Optional[Tuple[int, int]] = None
+        self._version: Optional[int] = None
+
+    def connection(self) -> sqlite3.Connection:
+        return self._db.get()
+
+    def changed(self) -> bool:
+        """Изменился ли счётчик с прошлого вызова (первый вызов — True)."""
+        data_version = self._db.data_version()
+        if data_version == self._data_version:
+            return False
+        self._data_version = data_version
+        try:
+            row = self._db.get().execute(f"SELECT version FROM {self.table} WHERE id = 1").fetchone()
+            version = row[0] if row else None
+        except sqlite3.OperationalError:
+            # Старая база без счётчика: считаем изменением любую запись
+            version = None
+        if version is not None and version == self._version:
+            return False
+        self._version = version
+        return True
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def close_all_managers() -> None:
+    """Закрыть все соединения всех баз (корректное завершение процесса)."""
+    for manager in _managers.values():
+        manager.close_all()
+
+
+atexit.register(close_all_managers)
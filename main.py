@@ -1,20 +1,43 @@
 from pathlib import Path
+import threading
 from ui import QuizUI
 from quiz import QuizGame
+from pack import get_question_pack
+from selection import get_adaptive_selector
+from seen import get_seen_store
 from user import UserProfile
+from controller import GameController
+from replay import SessionRecorder
+from tk_executor import TkExecutor
 from scripts.init_db import init_database
+from db import close_all_managers
 
 DB_PATH = Path("data/app.db")
+# Скомпилированный пакет вопросов (scripts/build_pack.py); используется, если собран из текущей базы
+PACK_PATH = Path("data/questions.qpack")
+# Журнал завершённых игр для воспроизведения (scripts/replay_sessions.py); None — не записывать
+SESSION_LOG_PATH = Path("data/sessions.log")
 
 def main():
-    # 1. Инициализация базы
+    # 1. Инициализация базы (идемпотентна: для существующей базы создаёт недостающие индексы)
     if not DB_PATH.exists():
         print("[INFO] Database not found, initializing...")
-        init_database(DB_PATH)
+    init_database(DB_PATH)
 
     # 2. Создание основных объектов
     profile = UserProfile(DB_PATH)
-    game = QuizGame(DB_PATH)
+    bank = None
+    if PACK_PATH.exists():
+        try:
+            pack = get_question_pack(PACK_PATH)
+            if pack.is_current(DB_PATH):
+                bank = pack
+            else:
+                print(f"[INFO] {PACK_PATH} is out of date, reading questions from the database")
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Question pack {PACK_PATH} not loaded: {e}")
+    # Вопросы подбираются по сложности под уровень игрока, без повторов уже виденных
+    game = QuizGame(DB_PATH, bank, get_adaptive_selector(DB_PATH), get_seen_store(DB_PATH))
     ui = QuizUI()
 
     # 3. Гарантия наличия пользователя
@@ -23,76 +46,114 @@ def main():
     # 4. Подготовка категорий для UI
     ui.set_categories(game.list_categories())
 
+    # Ход игры ведёт контроллер, UI только отображает
+    recorder = SessionRecorder(SESSION_LOG_PATH) if SESSION_LOG_PATH is not None else None
+    controller = GameController(game, profile, user_id, recorder=recorder)
+
+    # Работа с базой идёт в пуле потоков, результат рисуется в потоке Tk (after),
+    # поэтому окно и таймер не замирают на медленном диске
+    executor = TkExecutor(ui)
+    # Состояние игры меняют фоновые задачи — по одной за раз
+    game_lock = threading.Lock()
+
+    def in_game(fn, *args):
+        with game_lock:
+            return fn(*args)
+
+    def show_message(kind: str, title: str, text: str):
+        try:
+            import tkinter.messagebox as messagebox
+            getattr(messagebox, kind)(title, text)
+        except Exception as msg_error:
+            print(f"[ERROR] Error showing message box: {msg_error}")
+
+    def show_turn(screen_id: int, turn):
+        # Игрок мог уйти с экрана, пока шла работа с базой
+        if ui.screen_id != screen_id:
+            return
+        if turn.finished:
+            ui.show_result(turn.score)
+        else:
+            ui.show_question(turn.question, turn.remaining, turn.score, turn.timer_sec)
+
+    def game_failed(e: BaseException):
+        print(f"[ERROR] Game error: {e}")
+        show_message("showerror", "Ошибка", f"Ошибка игры: {e}")
+        ui.show_main_menu()
+
     # ====== Колбэки ======
 
     def on_start_game(category: str):
-        game.start_game(category)
-        q = game.get_next_question()
-        if q:
-            remaining_for_ui = game.get_remaining() + 1  # включаем текущий
-            ui.show_question(q, remaining_for_ui, game.get_score(), 20)
-        else:
-            ui.show_result(game.get_score())
+        screen_id = ui.show_loading("Загрузка вопросов...")
+        executor.submit(in_game, controller.start, category,
+                        on_done=lambda turn: show_turn(screen_id, turn), on_error=game_failed)
+
+    def on_start_review():
+        screen_id = ui.show_loading("Подбор вопросов для повторения...")
+
+        def done(turn):
+            if ui.screen_id != screen_id:
+                return
+            if turn.finished:
+                ui.show_main_menu()
+                show_message("showinfo", "Повторение", "Сейчас нечего повторять")
+            else:
+                show_turn(screen_id, turn)
+
+        executor.submit(in_game, controller.start_review, on_done=done, on_error=game_failed)
 
     def on_answer(question_id: int, index: int, time_spent_sec: int):
-        is_correct = game.check_answer(question_id, index, time_spent_sec)
-        print(f"[DEBUG] Answer: {'correct' if is_correct else 'wrong'}")
-        q = game.get_next_question()
-        if q:
-            remaining_for_ui = game.get_remaining() + 1
-            ui.show_question(q, remaining_for_ui, game.get_score(), 20)
-        else:
-            # сохраняем результат
-            profile.save_result(user_id, game.get_score(), 20 * len(game.questions), q.category if q else "unknown")
-            ui.show_result(game.get_score())
+        # Пока ответ записывается, вместо вопроса — заглушка, как при старте игры
+        screen_id = ui.show_loading("Проверка ответа...")
+
+        def done(turn):
+            print(f"[DEBUG] Answer: {'correct' if turn.last_correct else 'wrong'}")
+            show_turn(screen_id, turn)
+
+        executor.submit(in_game, controller.answer, question_id, index, time_spent_sec,
+                        on_done=done, on_error=game_failed)
 
     def on_time_up(question_id: int, time_spent_sec: int):
         print(f"[DEBUG] Time is up for question {question_id}")
-        # считаем как неправильный ответ
-        q = game.get_next_question()
-        if q:
-            remaining_for_ui = game.get_remaining() + 1
-            ui.show_question(q, remaining_for_ui, game.get_score(), 20)
-        else:
-            profile.save_result(user_id, game.get_score(), 20 * len(game.questions), q.category if q else "unknown")
-            ui.show_result(game.get_score())
+        screen_id = ui.show_loading("Время вышло...")
+        executor.submit(in_game, controller.timeout, question_id, time_spent_sec,
+                        on_done=lambda turn: show_turn(screen_id, turn), on_error=game_failed)
 
     def on_open_profile():
-        try:
-            print(f"[DEBUG] Loading profile for user_id: {user_id}")
-            data = profile.load_profile(user_id)
-            stats = profile.get_stats(user_id)
+        print(f"[DEBUG] Loading profile for user_id: {user_id}")
+        screen_id = ui.show_loading("Загрузка профиля...")
+
+        def load():
+            return profile.load_profile(user_id), profile.get_stats(user_id)
+
+        def done(result):
+            data, stats = result
             print(f"[DEBUG] Profile loaded: {data}")
-            ui.show_profile(data, stats)
-        except Exception as e:
+            if ui.screen_id == screen_id:
+                ui.show_profile(data, stats)
+
+        def failed(e: BaseException):
             print(f"[ERROR] Error loading profile: {e}")
-            try:
-                import tkinter.messagebox as messagebox
-                messagebox.showerror("Ошибка", f"Не удалось загрузить профиль: {str(e)}")
-            except Exception:
-                pass
+            show_message("showerror", "Ошибка", f"Не удалось загрузить профиль: {str(e)}")
             ui.show_main_menu()
 
+        executor.submit(load, on_done=done, on_error=failed)
+
     def on_update_profile(name, avatar_path):
-        try:
-            print(f"[DEBUG] Updating profile: name='{name}', avatar_path='{avatar_path}'")
-            profile.update_profile(user_id, name, avatar_path)
+        print(f"[DEBUG] Updating profile: name='{name}', avatar_path='{avatar_path}'")
+        ui.show_loading("Сохранение профиля...")
+
+        def done(_):
             print("[DEBUG] Profile updated successfully")
             on_open_profile()
-        except Exception as e:
+
+        def failed(e: BaseException):
             print(f"[ERROR] Error updating profile: {e}")
-            try:
-                # Показываем ошибку пользователю
-                import tkinter.messagebox as messagebox
-                messagebox.showerror("Ошибка", f"Не удалось обновить профиль: {str(e)}")
-            except Exception as msg_error:
-                print(f"[ERROR] Error showing message box: {msg_error}")
-            # Возвращаемся к профилю без изменений
-            try:
-                on_open_profile()
-            except Exception as profile_error:
-                print(f"[ERROR] Error reopening profile: {profile_error}")
-                ui.show_main_menu()
+            # Показываем ошибку пользователю и возвращаемся к профилю без изменений
+            show_message("showerror", "Ошибка", f"Не удалось обновить профиль: {str(e)}")
+            on_open_profile()
+
+        executor.submit(profile.update_profile, user_id, name, avatar_path, on_done=done, on_error=failed)
 
     def on_back_to_menu():
         ui.show_main_menu()
@@ -104,13 +165,21 @@ def main():
         on_time_up,
         on_open_profile,
         on_update_profile,
-        on_back_to_menu
+        on_back_to_menu,
+        on_start_review
     )
 
     # 6. Запуск
     ui.show_main_menu()
     ui.mainloop()
 
+    # 7. Дожидаемся фоновых задач, закрываем журнал сессий и соединения с базой
+    # (WAL-чекпоинт при закрытии последнего)
+    executor.shutdown()
+    if recorder is not None:
+        recorder.close()
+    close_all_managers()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,259 @@
+"""Скомпилированные пакеты вопросов: бинарный файл только для чтения, открываемый через mmap.
+
+Формат (little-endian, секции выровнены по 8 байт):
+
+    заголовок        PACK_HEADER
+    каталог          n_categories записей CATEGORY_ENTRY: имя и диапазон [first, first + count)
+    record_ids       n_questions × int64 — id в порядке (category, id)
+    sorted_ids       n_questions × int64 — id по возрастанию
+    sorted_pos       n_questions × uint32 — номер записи для sorted_ids[i]
+    records          n_questions × QUESTION_RECORD: смещение текста и длины строк
+    strings          UTF-8 текст вопросов, вариантов и названий категорий
+
+Вопросы одной категории лежат подряд, поэтому category_ids — срез record_ids
+без копирования, а get — двоичный поиск по sorted_ids. Строки декодируются
+только для запрошенных вопросов. Несколько процессов, открывших один файл,
+делят его страницы в page cache.
+"""
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+
+from db import SharedRegistry, get_manager
+from quiz import QUESTION_COLUMNS, Question, _question_from_row
+
+PACK_MAGIC = b"QPAK"
+PACK_FORMAT_VERSION = 1
+
+# magic, версия формата, резерв, число вопросов, число категорий,
+# bank_version исходной базы (-1 — неизвестна), смещения шести секций
+PACK_HEADER = struct.Struct("<4sHHIIq6Q")
+# смещение имени в strings, длина имени, первая запись, число записей, резерв
+CATEGORY_ENTRY = struct.Struct("<QIIII")
+# смещение текста в strings, длины текста и четырёх вариантов, correct_index, резерв
+QUESTION_RECORD = struct.Struct("<Q5IB7x")
+
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_pack(path: Path, questions: Iterable[Question], source_version: Optional[int] = None) -> int:
+    """Записать вопросы в пакет. Возвращает число вопросов.
+
+    Файл собирается рядом и подменяется через os.replace: процессы, у которых
+    открыт старый пакет, продолжают читать свою копию.
+    """
+    questions = sorted(questions, key=lambda q: (q.category, q.id))
+
+    strings = bytearray()
+    categories: Dict[str, List[int]] = {}
+    records = []
+    for position, question in enumerate(questions):
+        parts = [question.text.encode("utf-8")] + [option.encode("utf-8") for option in question.options]
+        if len(parts) != 5:
+            raise ValueError(f"Вопрос {question.id}: ожидалось 4 варианта ответа")
+        records.append(QUESTION_RECORD.pack(len(strings), *(len(part) for part in parts), question.correct_index))
+        for part in parts:
+            strings += part
+        entry = categories.get(question.category)
+        if entry is None:
+            categories[question.category] = [position, 0]
+        categories[question.category][1] += 1
+
+    directory = []
+    for name, (first, count) in categories.items():
+        encoded = name.encode("utf-8")
+        directory.append(CATEGORY_ENTRY.pack(len(strings), len(encoded), first, count, 0))
+        strings += encoded
+
+    record_ids = array("q", (question.id for question in questions))
+    order = sorted(range(len(questions)), key=lambda i: record_ids[i])
+    sorted_ids = array("q", (record_ids[i] for i in order))
+    sorted_pos = array("I", order)
+    if not _NATIVE_LITTLE_ENDIAN:
+        for values in (record_ids, sorted_ids, sorted_pos):
+            values.byteswap()
+
+    sections = [b"".join(directory), record_ids.tobytes(), sorted_ids.tobytes(),
+                sorted_pos.tobytes(), b"".join(records), bytes(strings)]
+    offsets = []
+    offset = PACK_HEADER.size
+    for section in sections:
+        offset = _align(offset)
+        offsets.append(offset)
+        offset += len(section)
+
+    header = PACK_HEADER.pack(PACK_MAGIC, PACK_FORMAT_VERSION, 0, len(questions), len(categories),
+                              -1 if source_version is None else source_version, *offsets)
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for section_offset, section in zip(offsets, sections):
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(section)
+    os.replace(tmp_path, path)
+    return len(questions)
+
+
+def read_bank_version(db_path: Path) -> Optional[int]:
+    """Текущий bank_version базы (None — счётчика нет)."""
+    try:
+        row = get_manager(db_path).connection().execute(
+            "SELECT version FROM bank_version WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def build_pack(db_path: Path, path: Path) -> int:
+    """Скомпилировать пакет из таблицы questions базы."""
+    conn = get_manager(db_path).connection()
+    # Версия и вопросы читаются в одной транзакции: пакет соответствует ровно этой версии
+    conn.execute("BEGIN")
+    try:
+        version = read_bank_version(db_path)
+        questions = [_question_from_row(row) for row in
+                     conn.execute(f"SELECT {QUESTION_COLUMNS} FROM questions")]
+    finally:
+        conn.rollback()
+    return write_pack(path, questions, version)
+
+
+class QuestionPack:
+    """Банк вопросов из скомпилированного пакета с тем же интерфейсом, что QuestionBank.
+
+    При открытии читаются только заголовок и каталог категорий; вопросы
+    собираются из mmap по запросу.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._mmap
+        try:
+            (magic, version, _, count, n_categories, source_version,
+             dir_off, record_ids_off, sorted_ids_off, sorted_pos_off,
+             records_off, strings_off) = PACK_HEADER.unpack_from(buf, 0)
+        except struct.error:
+            self._mmap.close()
+            raise ValueError(f"{self.path}: файл слишком короткий для пакета вопросов")
+        if magic != PACK_MAGIC or version != PACK_FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{self.path}: неподдерживаемый формат пакета вопросов")
+
+        self.source_version = None if source_version < 0 else source_version
+        self._count = count
+        self._records_off = records_off
+        self._strings_off = strings_off
+
+        view = memoryview(buf)
+        self._record_ids = self._int_view(view, record_ids_off, count, "q")
+        self._sorted_ids = self._int_view(view, sorted_ids_off, count, "q")
+        self._sorted_pos = self._int_view(view, sorted_pos_off, count, "I")
+
+        self._categories: Dict[str, Sequence[int]] = {}
+        self._category_by_record: List[tuple] = []
+        for i in range(n_categories):
+            name_off, name_len, first, cat_count, _ = CATEGORY_ENTRY.unpack_from(buf, dir_off + i * CATEGORY_ENTRY.size)
+            start = strings_off + name_off
+            name = sys.intern(buf[start:start + name_len].decode("utf-8"))
+            self._categories[name] = self._record_ids[first:first + cat_count]
+            self._category_by_record.append((first, name))
+        self._category_firsts = [first for first, _ in self._category_by_record]
+        self._names = sorted(self._categories)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _int_view(view: memoryview, offset: int, count: int, typecode: str) -> Sequence[int]:
+        """Массив чисел из секции: без копирования на little-endian, иначе копия с разворотом байт."""
+        size = array(typecode).itemsize
+        section = view[offset:offset + count * size]
+        if _NATIVE_LITTLE_ENDIAN:
+            return section.cast(typecode)
+        values = array(typecode, section.tobytes())
+        values.byteswap()
+        return values
+
+    @classmethod
+    def open(cls, path: Path) -> "QuestionPack":
+        return cls(path)
+
+    def close(self) -> None:
+        """Отпустить mmap. Срезы category_ids после этого использовать нельзя."""
+        with self._lock:
+            for values in (self._record_ids, self._sorted_ids, self._sorted_pos, *self._categories.values()):
+                if isinstance(values, memoryview):
+                    values.release()
+            self._categories.clear()
+            self._mmap.close()
+
+    def is_current(self, db_path: Path) -> bool:
+        """Пакет собран из текущего состояния таблицы questions базы."""
+        return self.source_version is not None and self.source_version == read_bank_version(db_path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def list_categories(self) -> List[str]:
+        return list(self._names)
+
+    def category_ids(self, category: str) -> Sequence[int]:
+        return self._categories.get(category, ())
+
+    def _position(self, question_id: int) -> Optional[int]:
+        sorted_ids = self._sorted_ids
+        i = bisect_left(sorted_ids, question_id)
+        if i < self._count and sorted_ids[i] == question_id:
+            return self._sorted_pos[i]
+        return None
+
+    def _decode(self, position: int) -> Question:
+        buf = self._mmap
+        text_off, *lengths, correct_index = QUESTION_RECORD.unpack_from(
+            buf, self._records_off + position * QUESTION_RECORD.size)
+        start = self._strings_off + text_off
+        parts = []
+        for length in lengths:
+            parts.append(buf[start:start + length].decode("utf-8"))
+            start += length
+        category = self._category_by_record[bisect_left(self._category_firsts, position + 1) - 1][1]
+        return Question(
+            id=self._record_ids[position],
+            category=category,
+            text=parts[0],
+            options=tuple(parts[1:]),
+            correct_index=correct_index
+        )
+
+    def get(self, question_id: int) -> Optional[Question]:
+        position = self._position(question_id)
+        return None if position is None else self._decode(position)
+
+    def get_many(self, ids: Iterable[int]) -> List[Question]:
+        questions = []
+        for question_id in ids:
+            position = self._position(question_id)
+            if position is not None:
+                questions.append(self._decode(position))
+        return questions
+
+
+_shared_packs: SharedRegistry[QuestionPack] = SharedRegistry(QuestionPack)
+
+
+def get_question_pack(path: Path) -> QuestionPack:
+    """Общий QuestionPack для файла: один mmap на процесс."""
+    return _shared_packs.get(path)
@@ -1,67 +1,261 @@
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
-import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 import random
+import sys
+import threading
+import time
 
-START_SECONDS = 20
+from db import SharedRegistry, VersionCounter, get_manager
+from review import due_questions
+from scoring import START_SECONDS, answer_points
+from seen import sample_unseen
 
-@dataclass
+QUESTION_COLUMNS = "id, category, text, option1, option2, option3, option4, correct_index"
+
+@dataclass(slots=True)
 class Question:
     id: int
     category: str
     text: str
-    options: List[str]
+    options: Sequence[str]
     correct_index: int
 
+
+def _question_from_row(row) -> Question:
+    """Собрать Question из строки SELECT QUESTION_COLUMNS."""
+    return Question(
+        id=row[0],
+        category=sys.intern(row[1]),
+        text=row[2],
+        options=(row[3], row[4], row[5], row[6]),
+        correct_index=row[7]
+    )
+
+
+class QuestionBank:
+    """Общий набор вопросов в памяти: загружается один раз и разделяется между играми.
+
+    Вопросы хранятся как Question со __slots__ и кортежем вариантов,
+    названия категорий интернированы, id по категориям лежат в array.
+    Все операции поиска — O(1) по словарю.
+    """
+
+    def __init__(self, questions: Iterable[Question]):
+        self._by_id: Dict[int, Question] = {}
+        self._by_category: Dict[str, array] = {}
+        for question in questions:
+            self._by_id[question.id] = question
+            ids = self._by_category.get(question.category)
+            if ids is None:
+                ids = self._by_category[question.category] = array("q")
+            ids.append(question.id)
+        self._categories = sorted(self._by_category)
+
+    @classmethod
+    def load(cls, db_path: Path) -> "QuestionBank":
+        """Прочитать все вопросы из базы одним запросом."""
+        cur = get_manager(db_path).connection().execute(f"SELECT {QUESTION_COLUMNS} FROM questions ORDER BY id")
+        return cls(_question_from_row(row) for row in cur)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def list_categories(self) -> List[str]:
+        return list(self._categories)
+
+    def category_ids(self, category: str) -> Sequence[int]:
+        return self._by_category.get(category, ())
+
+    def get(self, question_id: int) -> Optional[Question]:
+        return self._by_id.get(question_id)
+
+    def get_many(self, ids: Iterable[int]) -> List[Question]:
+        by_id = self._by_id
+        return [by_id[i] for i in ids if i in by_id]
+
+
+class QuestionCache:
+    """Кэш вопросов поверх SQLite с проверкой актуальности.
+
+    Список категорий и id по категориям кэшируются целиком, сами вопросы —
+    в ограниченном LRU. Перед каждым обращением проверяется PRAGMA data_version
+    (бесплатно, без чтения страниц); если базу меняло другое соединение,
+    читается счётчик bank_version, который триггеры увеличивают при любом
+    изменении таблицы questions. Кэш сбрасывается только когда изменились вопросы.
+    """
+
+    def __init__(self, db_path: Path, maxsize: int = 4096):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # Собственное соединение: data_version меняется только от чужих записей
+        self._bank = VersionCounter(db_path)
+        self._categories: Optional[List[str]] = None
+        self._category_ids: Dict[str, Sequence[int]] = {}
+        self._questions: "OrderedDict[int, Question]" = OrderedDict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._bank.close()
+
+    def _validate(self) -> None:
+        """Сбросить кэш, если таблица questions изменилась. Вызывать под self._lock."""
+        if self._bank.changed():
+            self._categories = None
+            self._category_ids.clear()
+            self._questions.clear()
+
+    def list_categories(self) -> List[str]:
+        with self._lock:
+            self._validate()
+            if self._categories is None:
+                cur = self._bank.connection().execute("SELECT DISTINCT category FROM questions ORDER BY category")
+                self._categories = [row[0] for row in cur]
+            return list(self._categories)
+
+    def category_ids(self, category: str) -> Sequence[int]:
+        """Список id вопросов категории (читается по индексу один раз)."""
+        with self._lock:
+            self._validate()
+            ids = self._category_ids.get(category)
+            if ids is None:
+                cur = self._bank.connection().execute(
+                    "SELECT id FROM questions WHERE category = ? ORDER BY id", (category,)
+                )
+                ids = self._category_ids[category] = array("q", (row[0] for row in cur))
+            return ids
+
+    def get(self, question_id: int) -> Optional[Question]:
+        questions = self.get_many([question_id])
+        return questions[0] if questions else None
+
+    def get_many(self, ids: Iterable[int]) -> List[Question]:
+        """Вопросы по id в порядке ids; в базу идут только промахи кэша."""
+        ids = list(ids)
+        with self._lock:
+            self._validate()
+            cached = self._questions
+            missing = [i for i in ids if i not in cached]
+            if missing:
+                placeholders = ", ".join("?" * len(missing))
+                cur = self._bank.connection().execute(
+                    f"SELECT {QUESTION_COLUMNS} FROM questions WHERE id IN ({placeholders})", missing
+                )
+                for row in cur:
+                    cached[row[0]] = _question_from_row(row)
+
+            questions = []
+            for question_id in ids:
+                question = cached.get(question_id)
+                if question is None:
+                    # Вопрос удалён после построения списка id
+                    continue
+                cached.move_to_end(question_id)
+                questions.append(question)
+
+            while len(cached) > self.maxsize:
+                cached.popitem(last=False)
+            return questions
+
+
+_shared_caches: SharedRegistry[QuestionCache] = SharedRegistry(QuestionCache)
+
+
+def get_question_cache(db_path: Path) -> QuestionCache:
+    """Общий QuestionCache для базы: все игры процесса делят один кэш."""
+    return _shared_caches.get(db_path)
+
+
 class QuizGame:
-    def __init__(self, db_path: Path):
+    # Без __dict__: в многосессионном режиме (session.py) игр в процессе тысячи
+    __slots__ = ("db_path", "bank", "selector", "seen", "score", "questions", "current_index", "answers",
+                 "_questions_by_id")
+
+    def __init__(self, db_path: Path, bank: Optional[QuestionBank] = None, selector=None, seen=None):
         self.db_path = db_path
+        # Источник вопросов: общий банк в памяти или кэш поверх SQLite
+        self.bank = bank if bank is not None else get_question_cache(db_path)
+        # Адаптивный выбор (selection.AdaptiveSelector); None — равномерная выборка
+        self.selector = selector
+        # Уже виденные игроком вопросы (seen.SeenStore); None — повторы не отслеживаются
+        self.seen = seen
         self.score = 0
         self.questions = []
         self.current_index = 0
+        # Ответы текущей игры: (question_id, selected_index | None, is_correct, time_spent_sec).
+        # Копятся в памяти и записываются одной пачкой в UserProfile.save_result
+        self.answers: List[Tuple[int, Optional[int], int, float]] = []
+        self._questions_by_id: Dict[int, Question] = {}
 
     def list_categories(self) -> List[str]:
         """Получить список доступных категорий из базы данных."""
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT DISTINCT category FROM questions ORDER BY category")
-            categories = [row[0] for row in cur.fetchall()]
-        return categories
-
-    def start_game(self, category: str, questions_count: int = 10) -> None:
-        """Начать игру с выбором вопросов из указанной категории."""
+        return self.bank.list_categories()
+
+    def start_game(self, category: str, questions_count: int = 10, user_id: Optional[int] = None,
+                   rng: Optional[random.Random] = None) -> None:
+        """Начать игру с выбором вопросов из указанной категории.
+
+        С селектором вопросы подбираются по сложности под уровень игрока user_id.
+        С хранилищем seen игроку не выдаются уже виденные вопросы; когда
+        невиденных не хватает на игру, категория начинается заново.
+        rng — генератор для выбора вопросов (по умолчанию модуль random);
+        с random.Random(seed) выбор воспроизводим при том же состоянии базы.
+        """
         self.reset()
-        
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.cursor()
-            
-            # Получаем все вопросы из категории
-            cur.execute("""
-                SELECT id, category, text, option1, option2, option3, option4, correct_index 
-                FROM questions 
-                WHERE category = ?
-            """, (category,))
-            
-            rows = cur.fetchall()
-        
+        rng = rng or random
+
+        ids = self.bank.category_ids(category)
+        seen = None
+        # Категория меньше игры выдаётся целиком — отслеживать нечего
+        if self.seen is not None and user_id is not None and len(ids) > questions_count:
+            seen = self.seen.get(user_id, category)
+
+        selected_ids = self._pick(category, ids, questions_count, user_id, seen, rng)
+        wanted = min(questions_count, len(ids))
+        if seen is not None and len(selected_ids) < wanted:
+            # Категория пройдена: новый круг, без повторов внутри этой игры
+            seen = self.seen.reset(user_id, category)
+            self.seen.mark(user_id, category, selected_ids)
+            selected_ids += self._pick(category, ids, wanted - len(selected_ids), user_id, seen, rng)
+        if seen is not None:
+            self.seen.mark(user_id, category, selected_ids)
+
+        self._load_questions(selected_ids)
+
+    def start_review(self, user_id: int, questions_count: int = 10, now: Optional[int] = None) -> None:
+        """Начать повторение: до questions_count вопросов, на которые игрок ошибся и срок которых наступил.
+
+        Если повторять нечего, список вопросов пуст.
+        """
+        self.reset()
+        now = int(time.time()) if now is None else now
+        self._load_questions(due_questions(get_manager(self.db_path).connection(), user_id, now, questions_count))
+
+    def start_with_questions(self, question_ids: Sequence[int]) -> None:
+        """Начать игру с заданными вопросами в заданном порядке (например, при воспроизведении записи)."""
+        self.reset()
+        self._load_questions(question_ids)
+
+    def _load_questions(self, question_ids: Sequence[int]) -> None:
+        self.questions.extend(self.bank.get_many(question_ids))
+        self._questions_by_id = {question.id: question for question in self.questions}
+
+    def _pick(self, category: str, ids: Sequence[int], count: int, user_id: Optional[int], seen,
+              rng=random) -> List[int]:
+        """До count id вопросов категории, которых нет в seen."""
+        if self.selector is not None:
+            return self.selector.sample(category, count, user_id, rng=rng, exclude=seen)
+        if seen is not None:
+            return sample_unseen(ids, seen, count, rng)
+
         # Если вопросов меньше чем questions_count — брать все
-        if len(rows) <= questions_count:
-            selected_rows = rows
-        else:
-            # Случайно выбираем нужное количество вопросов
-            selected_rows = random.sample(rows, questions_count)
-        
-        # Преобразуем в объекты Question
-        for row in selected_rows:
-            question = Question(
-                id=row[0],
-                category=row[1],
-                text=row[2],
-                options=[row[3], row[4], row[5], row[6]],
-                correct_index=row[7]
-            )
-            self.questions.append(question)
+        if len(ids) <= count:
+            return list(ids)
+        # Выбираем позиции, а не строки: стоимость зависит только от questions_count
+        return [ids[i] for i in rng.sample(range(len(ids)), count)]
 
     def get_next_question(self) -> Optional[Question]:
         """Получить следующий вопрос."""
@@ -74,27 +268,25 @@ class QuizGame:
     def check_answer(self, question_id: int, selected_index: int, time_spent_sec: float) -> bool:
         """Проверить ответ и обновить счет."""
         # Находим вопрос по ID
-        current_question = None
-        for question in self.questions:
-            if question.id == question_id:
-                current_question = question
-                break
-        
+        current_question = self._questions_by_id.get(question_id)
+
         if current_question is None:
             return False
         
         # Проверяем правильность ответа
         is_correct = selected_index == current_question.correct_index
+        self.answers.append((question_id, selected_index, int(is_correct), time_spent_sec))
         
-        if is_correct:
-            # Базовые 100 очков за правильный ответ
-            base_points = 100
-            # Бонус за скорость: (20 - время) * 5
-            speed_bonus = max(0, (START_SECONDS - time_spent_sec) * 5)
-            self.score += base_points + int(speed_bonus)
+        # 100 очков за правильный ответ и бонус за скорость (20 - время) * 5 — scoring.answer_points
+        self.score += answer_points(is_correct, time_spent_sec)
         
         return is_correct
 
+    def record_timeout(self, question_id: int, time_spent_sec: float) -> None:
+        """Записать вопрос, на который не успели ответить (счёт не меняется)."""
+        if question_id in self._questions_by_id:
+            self.answers.append((question_id, None, 0, time_spent_sec))
+
     def get_score(self) -> int:
         """Получить текущий счет."""
         return self.score
@@ -108,3 +300,5 @@ class QuizGame:
         self.score = 0
         self.questions = []
         self.current_index = 0
+        self.answers = []
+        self._questions_by_id = {}
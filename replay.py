@@ -0,0 +1,184 @@
+"""Запись игровых сессий и их воспроизведение для сравнения сборок.
+
+SessionRecorder дописывает в журнал по одной строке JSON на завершённую игру:
+режим, категорию, seed выбора вопросов, id выданных вопросов, ответы
+(question_id, selected_index | None, time_spent_sec), очки и длительность.
+Журнал только дописывается — оборванную при сбое последнюю строку
+read_sessions пропускает.
+
+replay_sessions проигрывает журнал через QuizGame и UserProfile без пауз:
+вопросы выбираются заново с тем же seed (при другом состоянии базы набор
+может разойтись — тогда игра продолжается с записанными вопросами), ответы
+подаются с записанным временем. В отчёте — задержки шагов и расхождения
+вопросов и очков с записью. Игроков журнала, которых нет в базе (например,
+ботов scripts/bot_driver.py, созданных в другой базе), replay_sessions
+создаёт с теми же id, чтобы результаты можно было записать.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import datetime
+
+from db import get_manager
+from quiz import QuizGame
+from review import REVIEW_CATEGORY
+from user import UserProfile
+
+LOG_VERSION = 1
+MODE_GAME = "game"
+MODE_REVIEW = "review"
+
+
+class SessionRecorder:
+    """Журнал завершённых игр (JSON Lines, только дозапись), общий для потоков."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def new_seed(self) -> int:
+        return random.getrandbits(63)
+
+    def write(self, session: Dict[str, Any]) -> None:
+        line = json.dumps({"v": LOG_VERSION, **session}, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def session_record(game: QuizGame, user_id: int, mode: str, category: str, seed: Optional[int],
+                   started_ts: int, questions_count: int, question_ids: List[int], duration_sec: int) -> Dict[str, Any]:
+    """Запись завершённой игры для SessionRecorder.write."""
+    return {
+        "ts": started_ts,
+        "user_id": user_id,
+        "mode": mode,
+        "category": category,
+        "count": questions_count,
+        "seed": seed,
+        "questions": question_ids,
+        "answers": [[question_id, selected_index, time_spent_sec]
+                    for question_id, selected_index, _, time_spent_sec in game.answers],
+        "score": game.get_score(),
+        "duration_sec": duration_sec,
+    }
+
+
+def read_sessions(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                session = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"[WARNING] {path}:{line_no}: damaged record skipped")
+                continue
+            if session.get("v") != LOG_VERSION:
+                print(f"[WARNING] {path}:{line_no}: unsupported log version {session.get('v')!r}, skipped")
+                continue
+            yield session
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    """Задержки в микросекундах, в формате scripts/benchmark.py."""
+    if not samples:
+        return {}
+    samples = sorted(sample * 1e6 for sample in samples)
+    return {
+        "repeat": len(samples),
+        "min_us": round(samples[0], 2),
+        "median_us": round(statistics.median(samples), 2),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+
+def _ensure_user(db_path: Path, user_id: int) -> bool:
+    """Создать игрока журнала с тем же id, если его нет в базе. True — если создан."""
+    with get_manager(db_path).transaction() as conn:
+        return conn.execute(
+            "INSERT OR IGNORE INTO users (id, name, created_at) VALUES (?, ?, ?)",
+            (user_id, f"replay{user_id}", datetime.now().isoformat())).rowcount > 0
+
+
+def replay_sessions(db_path: Path, log_path: Path, game: Optional[QuizGame] = None,
+                    profile: Optional[UserProfile] = None, save: bool = True,
+                    limit: Optional[int] = None) -> Dict[str, Any]:
+    """Проиграть журнал log_path на базе db_path и вернуть отчёт.
+
+    game / profile — настроенные так же, как в проверяемой сборке (банк,
+    селектор, seen, фоновая запись); по умолчанию — обычные QuizGame и UserProfile.
+    save=False не пишет результаты (база не меняется, но и seen/review не
+    обновляются). Пишущий прогон стоит запускать на копии базы; недостающие
+    игроки создаются (report["created_users"]).
+    """
+    game = game or QuizGame(db_path)
+    profile = profile or UserProfile(db_path)
+    timings: Dict[str, List[float]] = {"start": [], "answer": [], "save": []}
+    sessions = diverged = score_mismatches = 0
+    known_users = set()
+    created_users = 0
+    perf = time.perf_counter
+    started = perf()
+
+    for session in read_sessions(log_path):
+        if limit is not None and sessions >= limit:
+            break
+        sessions += 1
+        user_id = session["user_id"]
+        recorded_ids = session["questions"]
+
+        t0 = perf()
+        if session["mode"] == MODE_REVIEW:
+            game.start_review(user_id, session["count"], now=session["ts"])
+        else:
+            game.start_game(session["category"], session["count"], user_id, random.Random(session["seed"]))
+        timings["start"].append(perf() - t0)
+        if [question.id for question in game.questions] != recorded_ids:
+            diverged += 1
+            game.start_with_questions(recorded_ids)
+
+        for question_id, selected_index, time_spent_sec in session["answers"]:
+            t0 = perf()
+            if selected_index is None:
+                game.record_timeout(question_id, time_spent_sec)
+            else:
+                game.check_answer(question_id, selected_index, time_spent_sec)
+            timings["answer"].append(perf() - t0)
+
+        if game.get_score() != session["score"]:
+            score_mismatches += 1
+        if save:
+            if user_id not in known_users:
+                known_users.add(user_id)
+                created_users += _ensure_user(db_path, user_id)
+            category = REVIEW_CATEGORY if session["mode"] == MODE_REVIEW else session["category"]
+            t0 = perf()
+            profile.save_result(user_id, game.get_score(), session["duration_sec"], category, game.answers)
+            timings["save"].append(perf() - t0)
+
+    elapsed = perf() - started
+    return {
+        "sessions": sessions,
+        "elapsed_sec": round(elapsed, 3),
+        "sessions_per_sec": round(sessions / elapsed, 1) if elapsed > 0 else 0.0,
+        "diverged_questions": diverged,
+        "score_mismatches": score_mismatches,
+        "created_users": created_users,
+        "latency": {name: _summary(samples) for name, samples in timings.items()},
+    }
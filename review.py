@@ -0,0 +1,86 @@
+"""Повторение ошибок по расписанию с растущими интервалами (spaced repetition).
+
+Очередь review_queue хранит для игрока вопросы, на которые он ответил неверно,
+со временем следующего показа due_ts. Индекс (user_id, due_ts) работает как
+очередь с приоритетом на диске: k ближайших к показу вопросов читаются
+за O(log n + k), без просмотра истории ответов.
+
+Неверный ответ ставит вопрос в очередь через FIRST_INTERVAL_SEC (или сбрасывает
+интервал), верный ответ на вопрос, срок которого наступил, удваивает интервал;
+после MAX_INTERVAL_SEC вопрос считается выученным и уходит из очереди.
+
+Игры-повторения не попадают в results и рейтинги: их ответы хранятся
+в review_answers и только двигают очередь (write_review_answers).
+"""
+import sqlite3
+from typing import List
+
+from db import SECONDS_PER_DAY
+
+FIRST_INTERVAL_SEC = SECONDS_PER_DAY
+MAX_INTERVAL_SEC = 64 * SECONDS_PER_DAY
+# Служебная категория, с которой игры-повторения передаются в UserProfile.save_result
+# («*» в начале, как у user.ALL_CATEGORIES, — не пересекается с категориями банка)
+REVIEW_CATEGORY = "*review"
+
+
+def write_reviews(conn: sqlite3.Connection, records) -> None:
+    """Обновить очередь повторения по ответам записанных игр (в открытой транзакции)."""
+    wrong = []
+    right = []
+    for row, answers in records:
+        user_id, played_ts = row[0], row[5]
+        for question_id, _, is_correct, _ in answers:
+            if is_correct:
+                right.append((played_ts, user_id, question_id, played_ts))
+            else:
+                wrong.append((user_id, question_id, played_ts + FIRST_INTERVAL_SEC, FIRST_INTERVAL_SEC))
+    if wrong:
+        conn.executemany(
+            '''INSERT INTO review_queue (user_id, question_id, due_ts, interval_sec) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, question_id) DO UPDATE SET
+                due_ts = excluded.due_ts,
+                interval_sec = excluded.interval_sec''',
+            wrong
+        )
+    if right:
+        conn.executemany(
+            '''UPDATE review_queue SET interval_sec = interval_sec * 2, due_ts = ? + interval_sec * 2
+            WHERE user_id = ? AND question_id = ? AND due_ts <= ?''',
+            right
+        )
+        conn.executemany(
+            "DELETE FROM review_queue WHERE user_id = ? AND question_id = ? AND interval_sec > ?",
+            [(user_id, question_id, MAX_INTERVAL_SEC) for _, user_id, question_id, _ in right]
+        )
+
+
+def write_review_answers(conn: sqlite3.Connection, records) -> None:
+    """Записать ответы игр-повторений в review_answers и обновить очередь (в открытой транзакции)."""
+    conn.executemany(
+        '''INSERT INTO review_answers (user_id, question_id, selected_index, is_correct, time_spent_sec, played_ts)
+        VALUES (?, ?, ?, ?, ?, ?)''',
+        [(row[0], question_id, selected_index, is_correct, time_spent_sec, row[5])
+         for row, answers in records
+         for question_id, selected_index, is_correct, time_spent_sec in answers]
+    )
+    write_reviews(conn, records)
+
+
+def due_questions(conn: sqlite3.Connection, user_id: int, now: int, limit: int) -> List[int]:
+    """До limit вопросов игрока, срок повторения которых наступил, начиная с самых давних.
+
+    Строки очереди удалённых из банка вопросов пропускаются (JOIN questions).
+    """
+    cur = conn.execute(
+        """SELECT r.question_id FROM review_queue r JOIN questions q ON q.id = r.question_id
+        WHERE r.user_id = ? AND r.due_ts <= ? ORDER BY r.due_ts LIMIT ?""",
+        (user_id, now, limit))
+    return [row[0] for row in cur]
+
+
+def count_due(conn: sqlite3.Connection, user_id: int, now: int) -> int:
+    """Сколько вопросов игроку пора повторить."""
+    return conn.execute(
+        """SELECT COUNT(*) FROM review_queue r JOIN questions q ON q.id = r.question_id
+        WHERE r.user_id = ? AND r.due_ts <= ?""", (user_id, now)).fetchone()[0]
@@ -0,0 +1,62 @@
+"""Правила начисления очков и пакетный пересчёт очков по журналу ответов.
+
+answer_points — очки за один ответ (его использует QuizGame.check_answer).
+score_answers / game_totals считают то же самое сразу для столбцов
+(is_correct, time_spent_sec) из таблицы answers: с NumPy — векторно,
+без него — тем же правилом в одном проходе на чистом Python.
+Результаты совпадают с answer_points до единицы: бонус считается в float64
+так же, как в Python, и отбрасывание дробной части для неотрицательных
+чисел совпадает с floor.
+"""
+from itertools import groupby
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен: без него работает запасной путь
+    np = None
+
+START_SECONDS = 20
+BASE_POINTS = 100
+# Очков бонуса за каждую сэкономленную секунду
+SPEED_POINTS = 5
+
+
+def answer_points(is_correct: bool, time_spent_sec: float) -> int:
+    """Очки за ответ: BASE_POINTS за верный плюс бонус за скорость, за неверный — 0."""
+    if not is_correct:
+        return 0
+    return BASE_POINTS + int(max(0, (START_SECONDS - time_spent_sec) * SPEED_POINTS))
+
+
+def score_answers(correct: Sequence[int], time_spent: Sequence[float]) -> List[int]:
+    """Очки за каждый ответ по столбцам is_correct и time_spent_sec."""
+    if np is not None:
+        return _points_numpy(correct, time_spent).tolist()
+    return [answer_points(c, t) for c, t in zip(correct, time_spent)]
+
+
+def game_totals(result_ids: Sequence[int], correct: Sequence[int],
+                time_spent: Sequence[float]) -> Tuple[List[int], List[int]]:
+    """Сумма очков по играм: (id игр, очки). Ответы одной игры должны идти подряд."""
+    if not result_ids:
+        return [], []
+    if np is not None:
+        ids = np.asarray(result_ids, dtype=np.int64)
+        starts = np.flatnonzero(np.concatenate(([True], ids[1:] != ids[:-1])))
+        totals = np.add.reduceat(_points_numpy(correct, time_spent), starts)
+        return ids[starts].tolist(), totals.tolist()
+    ids = []
+    totals = []
+    rows = zip(result_ids, correct, time_spent)
+    for result_id, group in groupby(rows, key=lambda row: row[0]):
+        ids.append(result_id)
+        totals.append(sum(answer_points(c, t) for _, c, t in group))
+    return ids, totals
+
+
+def _points_numpy(correct: Sequence[int], time_spent: Sequence[float]):
+    correct = np.asarray(correct, dtype=bool)
+    bonus = (START_SECONDS - np.asarray(time_spent, dtype=np.float64)) * SPEED_POINTS
+    points = BASE_POINTS + np.floor(np.maximum(bonus, 0)).astype(np.int64)
+    return np.where(correct, points, 0)
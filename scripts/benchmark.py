@@ -0,0 +1,186 @@
+"""Бенчмарки горячих путей quiz.py, user.py и init_db.py на синтетических базах.
+
+Результаты сохраняются в JSON, чтобы сравнивать их между коммитами:
+    python scripts/benchmark.py --sizes 10000 1000000
+    python scripts/benchmark.py --sizes 10000 --compare bench_results/old.json
+"""
+import argparse
+import csv
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from quiz import QuizGame, QuestionCache
+from scoring import score_answers
+from scripts.generate_data import generate
+from scripts.init_db import init_database
+from user import UserProfile
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+CATEGORIES = ["history", "science", "culture", "sport", "geography"]
+
+
+def build_database(db_path: Path, size: int, seed: int = 1) -> None:
+    """Создать базу с size вопросами и size результатами (пользователей — size / 100)."""
+    generate(db_path, questions=size, users=max(10, size // 100), results=size, seed=seed,
+             categories=CATEGORIES, category_skew=0.0)
+
+
+def timeit(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Время вызова fn в микросекундах: min/median/mean/p95."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_us": round(samples[0], 2),
+        "median_us": round(statistics.median(samples), 2),
+        "mean_us": round(statistics.fmean(samples), 2),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+
+def bench_size(db_path: Path, size: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    rng = random.Random(7)
+    users = max(10, size // 100)
+
+    # Холодный путь: новый кэш на каждый вызов (его соединение закрывается там же)
+    def cold(action: Callable[[QuizGame], object]) -> Callable[[], None]:
+        def run() -> None:
+            cache = QuestionCache(db_path)
+            try:
+                action(QuizGame(db_path, cache))
+            finally:
+                cache.close()
+        return run
+
+    results["list_categories_cold"] = timeit(cold(QuizGame.list_categories), max(3, repeat // 10))
+    results["start_game_cold"] = timeit(cold(lambda game: game.start_game("history")), max(3, repeat // 10))
+
+    cache = QuestionCache(db_path)
+    game = QuizGame(db_path, cache)
+    results["list_categories"] = timeit(game.list_categories, repeat)
+    results["start_game"] = timeit(lambda: game.start_game(rng.choice(CATEGORIES)), repeat)
+
+    game.start_game("history")
+    question = game.questions[0]
+    results["check_answer"] = timeit(lambda: game.check_answer(question.id, question.correct_index, 5), repeat)
+    # Пакетный пересчёт 10 000 ответов (ср. 10 000 вызовов check_answer)
+    correct = [rng.randint(0, 1) for _ in range(10_000)]
+    time_spent = [rng.randint(1, 20) for _ in range(10_000)]
+    results["score_answers_10k"] = timeit(lambda: score_answers(correct, time_spent), max(3, repeat // 10))
+
+    profile = UserProfile(db_path)
+    results["save_result"] = timeit(
+        lambda: profile.save_result(rng.randint(1, users), rng.randint(0, 2000), 60, rng.choice(CATEGORIES)),
+        repeat)
+    results["get_stats"] = timeit(lambda: profile.get_stats(rng.randint(1, users)), repeat)
+    results["load_profile"] = timeit(lambda: profile.load_profile(rng.randint(1, users)), repeat)
+    cache.close()
+    return results
+
+
+def bench_seeding(work_dir: Path, size: int) -> Dict[str, float]:
+    """Время init_database с CSV из size строк."""
+    seed_dir = work_dir / f"seed_{size}"
+    seed_dir.mkdir(parents=True, exist_ok=True)
+    seed_file = seed_dir / "seed_questions.csv"
+    if not seed_file.exists():
+        with open(seed_file, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["category", "text", "option1", "option2", "option3", "option4", "correct_index"])
+            for i in range(size):
+                writer.writerow([CATEGORIES[i % len(CATEGORIES)], f"Вопрос {i}?", "a", "b", "c", "d", i % 4])
+
+    db_path = seed_dir / "app.db"
+    db_path.unlink(missing_ok=True)
+    started = time.perf_counter()
+    init_database(db_path)
+    elapsed = time.perf_counter() - started
+    db_path.unlink(missing_ok=True)
+    return {"rows": size, "elapsed_sec": round(elapsed, 3), "rows_per_sec": round(size / elapsed, 1)}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline_path: Path) -> None:
+    """Напечатать отношение median текущего прогона к сохранённому."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    for size, ops in current["results"].items():
+        old_ops = baseline.get("results", {}).get(size, {})
+        for op, stats in ops.items():
+            old = old_ops.get(op)
+            if not old or "median_us" not in stats or not old.get("median_us"):
+                continue
+            ratio = stats["median_us"] / old["median_us"]
+            flag = "  <-- REGRESSION" if ratio > 1.2 else ""
+            print(f"{size:>10} {op:<22} {old['median_us']:>12.1f} -> {stats['median_us']:>12.1f} us  x{ratio:.2f}{flag}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарки Quiz Game")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--work-dir", type=Path, default=ROOT / "bench_results" / "dbs",
+                        help="каталог для синтетических баз (переиспользуются между запусками)")
+    parser.add_argument("--output", type=Path, help="JSON с результатами")
+    parser.add_argument("--compare", type=Path, help="JSON предыдущего прогона для сравнения")
+    parser.add_argument("--skip-seeding", action="store_true")
+    args = parser.parse_args()
+
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": {},
+    }
+
+    for size in args.sizes:
+        db_path = args.work_dir / f"bench_{size}.db"
+        if not db_path.exists():
+            print(f"[INFO] Building synthetic database with {size} rows...")
+            build_database(db_path, size)
+        print(f"[INFO] Benchmarking {size} rows...")
+        size_results = bench_size(db_path, size, args.repeat)
+        if not args.skip_seeding:
+            size_results["init_database_seeding"] = bench_seeding(args.work_dir, size)
+        report["results"][str(size)] = size_results
+
+    output = args.output or ROOT / "bench_results" / f"bench_{report['meta']['commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"[INFO] Results saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
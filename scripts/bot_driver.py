@@ -0,0 +1,117 @@
+"""Скриптовые боты для замера пропускной способности игры без интерфейса.
+
+Пример:
+    python scripts/bot_driver.py --games 5000 --bots 50
+"""
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from controller import GameController, play_scripted_game
+from pack import QuestionPack
+from replay import SessionRecorder
+from selection import get_adaptive_selector
+from seen import get_seen_store
+from quiz import QuizGame, QuestionBank
+from scripts.init_db import init_database
+from user import ResultWriter, UserProfile
+
+
+def run_bots(db_path: Path, games: int, bots: int, accuracy: float, seed: int,
+             use_bank: bool = True, batch_size: int = 0, pack_path: Optional[Path] = None,
+             adaptive: bool = False, no_repeat: bool = False, record_path: Optional[Path] = None) -> dict:
+    """Сыграть games игр ботами и вернуть сводку с числом игр в секунду.
+
+    batch_size > 0 включает фоновую запись результатов пачками (ResultWriter),
+    pack_path — брать вопросы из скомпилированного пакета, adaptive — подбирать
+    вопросы под уровень бота (AdaptiveSelector), no_repeat — не повторять
+    виденные ботом вопросы (SeenStore), record_path — записывать игры в журнал
+    для scripts/replay_sessions.py (SessionRecorder).
+    """
+    rng = random.Random(seed)
+    writer = ResultWriter(db_path, batch_size=batch_size) if batch_size > 0 else None
+    profile = UserProfile(db_path, writer)
+    if pack_path is not None:
+        bank = QuestionPack.open(pack_path)
+    else:
+        bank = QuestionBank.load(db_path) if use_bank else None
+    selector = get_adaptive_selector(db_path) if adaptive else None
+    seen = get_seen_store(db_path) if no_repeat else None
+    game = QuizGame(db_path, bank, selector, seen)
+    categories = game.list_categories()
+    if not categories:
+        raise ValueError(f"В базе {db_path} нет вопросов")
+
+    user_ids = [profile.create_profile(f"bot{i}") for i in range(bots)]
+    recorder = SessionRecorder(record_path) if record_path is not None else None
+    controllers = [GameController(QuizGame(db_path, bank, selector, seen), profile, user_id, recorder=recorder)
+                   for user_id in user_ids]
+
+    total_score = 0
+    started = time.perf_counter()
+    for i in range(games):
+        controller = controllers[i % bots]
+        turn = play_scripted_game(controller, rng.choice(categories), accuracy, rng)
+        total_score += turn.score
+    if writer is not None:
+        writer.close()
+    if recorder is not None:
+        recorder.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "games": games,
+        "bots": bots,
+        "elapsed_sec": round(elapsed, 3),
+        "games_per_sec": round(games / elapsed, 1) if elapsed else 0.0,
+        "avg_score": round(total_score / games, 2) if games else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон игры ботами")
+    parser.add_argument("--db", type=Path, help="база SQLite (по умолчанию — временная копия с seed-вопросами)")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--bots", type=int, default=10)
+    parser.add_argument("--accuracy", type=float, default=0.6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-bank", action="store_true", help="читать вопросы из SQLite через кэш, а не из QuestionBank")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="записывать результаты фоном пачками такого размера (0 — синхронно)")
+    parser.add_argument("--pack", type=Path, help="пакет вопросов .qpack (scripts/build_pack.py)")
+    parser.add_argument("--adaptive", action="store_true", help="адаптивный выбор вопросов под уровень бота")
+    parser.add_argument("--no-repeat", action="store_true", help="не повторять виденные ботом вопросы")
+    parser.add_argument("--record", type=Path, metavar="LOG", help="записать игры в журнал сессий (scripts/replay_sessions.py)")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    db_path = args.db
+    if db_path is None:
+        tmp_dir = Path(tempfile.mkdtemp(prefix="quiz-bots-"))
+        shutil.copy(ROOT / "data" / "seed_questions.csv", tmp_dir / "seed_questions.csv")
+        db_path = tmp_dir / "app.db"
+    init_database(db_path)
+
+    try:
+        summary = run_bots(db_path, args.games, args.bots, args.accuracy, args.seed,
+                           use_bank=not args.no_bank, batch_size=args.batch_size,
+                           pack_path=args.pack, adaptive=args.adaptive,
+                           no_repeat=args.no_repeat, record_path=args.record)
+        print(f"[INFO] {summary['games']} games in {summary['elapsed_sec']} s: "
+              f"{summary['games_per_sec']} games/sec, avg score {summary['avg_score']}")
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
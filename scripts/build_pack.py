@@ -0,0 +1,39 @@
+"""Скомпилировать банк вопросов из базы в бинарный пакет для быстрого холодного старта.
+
+Пример:
+    python scripts/build_pack.py data/app.db data/questions.qpack
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from pack import QuestionPack, build_pack
+from scripts.init_db import DEFAULT_DB_PATH
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сборка пакета вопросов (.qpack) из базы")
+    parser.add_argument("db", nargs="?", type=Path, default=DEFAULT_DB_PATH)
+    parser.add_argument("pack", nargs="?", type=Path, help="файл пакета (по умолчанию — questions.qpack рядом с базой)")
+    args = parser.parse_args()
+
+    pack_path = args.pack or args.db.parent / "questions.qpack"
+    started = time.perf_counter()
+    count = build_pack(args.db, pack_path)
+    elapsed = time.perf_counter() - started
+
+    pack = QuestionPack.open(pack_path)
+    try:
+        print(f"[INFO] Packed {count} questions in {len(pack.list_categories())} categories "
+              f"into {pack_path} ({pack_path.stat().st_size} bytes, {elapsed:.2f} s)")
+    finally:
+        pack.close()
+
+
+if __name__ == "__main__":
+    main()
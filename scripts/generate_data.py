@@ -0,0 +1,200 @@
+"""Генератор синтетических данных (вопросы, пользователи, результаты) для нагрузочных тестов.
+
+Данные воспроизводимы: одинаковые параметры и --seed дают одинаковую базу.
+Пример (10M результатов за несколько минут):
+    python scripts/generate_data.py data/load.db --questions 1000000 --users 100000 --results 10000000
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from scripts.init_db import deferred_indexes, init_database, rebuild_stats
+
+CATEGORIES = ["history", "science", "culture", "sport", "geography"]
+SCORE_DISTRIBUTIONS = ("normal", "uniform", "exponential")
+MAX_SCORE = 2000  # 10 вопросов по 100 очков + максимальный бонус за скорость
+CHUNK_SIZE = 50_000
+BASE_DATE = datetime(2024, 1, 1)
+
+
+def zipf_weights(n: int, skew: float) -> List[float]:
+    """Веса Ципфа: skew = 0 — равномерно, чем больше skew, тем сильнее перекос к первым."""
+    return [1.0 / (i + 1) ** skew for i in range(n)]
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate_questions(rng: random.Random, count: int, categories: List[str], skew: float) -> Iterator[tuple]:
+    cum_weights = _cumulative(zipf_weights(len(categories), skew))
+    for start in range(0, count, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, count - start)
+        picked = rng.choices(categories, cum_weights=cum_weights, k=n)
+        for offset, category in enumerate(picked):
+            i = start + offset
+            yield (category, f"Вопрос #{i} ({category})?", f"Ответ A{i}", f"Ответ B{i}",
+                   f"Ответ C{i}", f"Ответ D{i}", rng.randrange(4))
+
+
+def generate_users(count: int, first_id: int = 0) -> Iterator[tuple]:
+    created_at = BASE_DATE.isoformat()
+    for i in range(first_id, first_id + count):
+        yield (f"player{i}", created_at)
+
+
+def generate_results(rng: random.Random, count: int, user_ids: List[int], categories: List[str],
+                     category_skew: float, user_skew: float, score_dist: str, score_mean: float,
+                     score_std: float, days: int) -> Iterator[tuple]:
+    """Результаты игр: активность пользователей и категорий по Ципфу, у каждого игрока свой уровень."""
+    if score_dist not in SCORE_DISTRIBUTIONS:
+        raise ValueError(f"Неизвестное распределение очков: {score_dist}")
+
+    category_cum = _cumulative(zipf_weights(len(categories), category_skew))
+    user_cum = _cumulative(zipf_weights(len(user_ids), user_skew)) if user_skew else None
+    # Уровень игрока сдвигает его среднее — у сильных игроков стабильно выше счёт
+    skill = {user_id: rng.gauss(0.0, score_std / 2) for user_id in user_ids}
+    span_sec = days * 86400
+
+    for start in range(0, count, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, count - start)
+        users = rng.choices(user_ids, cum_weights=user_cum, k=n)
+        cats = rng.choices(categories, cum_weights=category_cum, k=n)
+        for user_id, category in zip(users, cats):
+            if score_dist == "normal":
+                score = rng.gauss(score_mean + skill[user_id], score_std)
+            elif score_dist == "uniform":
+                score = rng.uniform(0, MAX_SCORE)
+            else:
+                score = rng.expovariate(1.0 / max(1.0, score_mean + skill[user_id]))
+            score = min(MAX_SCORE, max(0, int(score)))
+            played_at = BASE_DATE + timedelta(seconds=rng.randrange(span_sec))
+            yield (user_id, category, score, rng.randint(30, 200), played_at.isoformat(),
+                   int(played_at.timestamp()))
+
+
+def _cumulative(weights: List[float]) -> List[float]:
+    total = 0.0
+    cum = []
+    for w in weights:
+        total += w
+        cum.append(total)
+    return cum
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterable[tuple]) -> int:
+    inserted = 0
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        conn.executemany(sql, chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+def generate(db_path: Path, questions: int = 0, users: int = 0, results: int = 0, seed: int = 42,
+             categories: Optional[List[str]] = None, category_skew: float = 1.0, user_skew: float = 1.0,
+             score_dist: str = "normal", score_mean: float = 800, score_std: float = 300,
+             days: int = 365) -> Dict[str, float]:
+    """Записать данные в базу (схема создаётся init_database). Возвращает счётчики и время."""
+    categories = categories or CATEGORIES
+    rng = random.Random(seed)
+    init_database(db_path)
+
+    conn = sqlite3.connect(db_path)
+    stats: Dict[str, float] = {}
+    started = time.perf_counter()
+    # Режим WAL хранится в файле базы: его не трогаем, остальные возвращаем в finally
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        if journal_mode != "wal":
+            conn.execute("PRAGMA journal_mode = MEMORY")
+        conn.execute("PRAGMA cache_size = -200000")
+
+        conn.execute("BEGIN")
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+        # Без построчных триггеров (bank_version, FTS): полнотекстовый индекс дополняется одним запросом
+        with deferred_indexes(conn, "questions", triggers=True):
+            stats["questions"] = _insert(conn, """
+                INSERT INTO questions (category, text, option1, option2, option3, option4, correct_index)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""", generate_questions(rng, questions, categories, category_skew))
+        if stats["questions"]:
+            conn.execute("""
+                INSERT INTO questions_fts (rowid, text, option1, option2, option3, option4)
+                SELECT id, text, option1, option2, option3, option4 FROM questions WHERE id > ?""", (last_id,))
+            conn.execute("UPDATE bank_version SET version = version + 1 WHERE id = 1")
+
+        first_user = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+        stats["users"] = _insert(conn, "INSERT INTO users (name, created_at) VALUES (?, ?)",
+                                 generate_users(users, first_user))
+        conn.commit()
+
+        if results:
+            user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+            if not user_ids:
+                raise ValueError("Для генерации результатов нужны пользователи (--users)")
+            conn.execute("BEGIN")
+            with deferred_indexes(conn, "results"):
+                stats["results"] = _insert(conn, """
+                    INSERT INTO results (user_id, category, score, duration_sec, played_at, played_ts)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    generate_results(rng, results, user_ids, categories, category_skew, user_skew,
+                                     score_dist, score_mean, score_std, days))
+            # Результаты вставлены в обход UserProfile — пересчитываем сводку целиком
+            rebuild_stats(conn)
+            conn.commit()
+        else:
+            stats["results"] = 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if journal_mode != "wal":
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.close()
+
+    stats["elapsed_sec"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных Quiz Game")
+    parser.add_argument("db", type=Path, help="файл базы SQLite")
+    parser.add_argument("--questions", type=int, default=0)
+    parser.add_argument("--users", type=int, default=0)
+    parser.add_argument("--results", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--categories", nargs="+", default=CATEGORIES)
+    parser.add_argument("--category-skew", type=float, default=1.0, help="показатель Ципфа для категорий (0 — равномерно)")
+    parser.add_argument("--user-skew", type=float, default=1.0, help="показатель Ципфа для активности игроков")
+    parser.add_argument("--score-dist", choices=SCORE_DISTRIBUTIONS, default="normal")
+    parser.add_argument("--score-mean", type=float, default=800)
+    parser.add_argument("--score-std", type=float, default=300)
+    parser.add_argument("--days", type=int, default=365, help="за сколько дней распределить played_at")
+    args = parser.parse_args()
+
+    stats = generate(args.db, args.questions, args.users, args.results, args.seed, args.categories,
+                     args.category_skew, args.user_skew, args.score_dist, args.score_mean,
+                     args.score_std, args.days)
+    rows = stats["questions"] + stats["users"] + stats["results"]
+    rate = rows / stats["elapsed_sec"] if stats["elapsed_sec"] else 0.0
+    print(f"[INFO] Generated {stats['questions']} questions, {stats['users']} users, "
+          f"{stats['results']} results in {stats['elapsed_sec']} s ({rate:.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
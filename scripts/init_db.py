@@ -1,110 +1,1135 @@
+import argparse
+import hashlib
 import sqlite3
+import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import csv
 
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from db import SECONDS_PER_DAY
+from review import FIRST_INTERVAL_SEC, MAX_INTERVAL_SEC
+from scoring import game_totals
+from seen import SeenSet, remove_seen
+from user import ALL_CATEGORIES, LEADERBOARD_K, SCORE_BUCKET
+from search import DUPLICATE_THRESHOLD, MAX_BUCKET_CANDIDATES, jaccard, lsh_buckets, shingles, similar_candidates
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent.parent / "data" / "app.db"
+
+QUESTION_CSV_HEADER = ["category", "text", "option1", "option2", "option3", "option4", "correct_index"]
+IMPORT_CHUNK_SIZE = 10_000
+# Сколько текстов ошибок валидации хранить в отчёте (считаются все)
+MAX_REPORTED_ERRORS = 1000
+
+INSERT_QUESTION_SQL = """
+    INSERT INTO questions (category, text, option1, option2, option3, option4, correct_index, key_hash, content_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def question_hashes(row: Tuple[Any, ...]) -> Tuple[str, str]:
+    """(key_hash, content_hash) вопроса из строки (category, text, option1..4, correct_index).
+
+    key_hash определяет «тот же вопрос» (категория + текст), content_hash меняется
+    при любом изменении вариантов или правильного ответа.
+    """
+    key = f"{row[0]}\x1f{row[1]}"
+    content = f"{key}\x1f{row[2]}\x1f{row[3]}\x1f{row[4]}\x1f{row[5]}\x1f{row[6]}"
+    return (hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest(),
+            hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest())
+
 
 def get_connection(db_path: Path) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA foreign_keys = ON")
     return conn
 
-def init_database(db_path: Path) -> None:
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = get_connection(db_path)
-    cur = conn.cursor()
 
+def _has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def rebuild_stats(conn: sqlite3.Connection, include_archive: bool = False) -> None:
+    """Пересчитать сводные таблицы по results (без commit).
+
+    Пересчитываются user_stats, user_category_stats, score_histogram,
+    results_daily, results_weekly и (по answers) question_stats и user_skill.
+    После archive_results в горячей таблице остаются не все игры:
+    include_archive=True учитывает и строки подключённой (ATTACH ... AS archive)
+    архивной базы; тогда же заново собирается archived_top.
+    Миграции 8, 10 и 12 только создают эти таблицы: для базы с историей
+    их заполняет эта функция (--rebuild-stats).
+    """
+    _rebuild_result_rollups(conn, include_archive)
+    _rebuild_answer_stats(conn, include_archive)
+    if include_archive:
+        _rebuild_archived_top(conn)
+    _bump_results_version(conn)
+
+
+def _bump_results_version(conn: sqlite3.Connection) -> None:
+    """Сообщить запущенным приложениям, что results/archived_top изменены в обход UserProfile.
+
+    Leaderboard (user.py) сверяет этот счётчик и перечитывает доски.
+    """
+    conn.execute("UPDATE results_version SET version = version + 1 WHERE id = 1")
+
+
+def _backfill_played_ts(conn: sqlite3.Connection) -> None:
+    """Досчитать played_ts играм, записанным до миграции 8 (поиск по idx_results_played)."""
+    conn.execute("""
+        UPDATE results SET played_ts = CAST(strftime('%s', played_at, 'utc') AS INTEGER)
+        WHERE played_ts IS NULL""")
+
+
+def _rebuild_result_rollups(conn: sqlite3.Connection, include_archive: bool = False) -> None:
+    """Пересчитать сводки по results (все таблицы rebuild_stats, кроме счётчиков ответов)."""
+    _backfill_played_ts(conn)
+    source = "results"
+    if include_archive:
+        source = """(SELECT user_id, category, score, played_ts FROM main.results
+                     UNION ALL
+                     SELECT user_id, category, score, played_ts FROM archive.results)"""
+
+    for table in ("user_stats", "user_category_stats", "score_histogram", "results_daily", "results_weekly"):
+        conn.execute(f"DELETE FROM {table}")
+    conn.execute(f"""
+        INSERT INTO user_stats (user_id, games, total_score, best_score)
+        SELECT user_id, COUNT(*), SUM(score), MAX(score)
+        FROM {source}
+        GROUP BY user_id""")
+    conn.execute(f"""
+        INSERT INTO user_category_stats (user_id, category, games, total_score, best_score)
+        SELECT user_id, category, COUNT(*), SUM(score), MAX(score)
+        FROM {source}
+        GROUP BY user_id, category""")
+    conn.execute(f"""
+        INSERT INTO score_histogram (category, bucket, games)
+        SELECT category, score / ?, COUNT(*)
+        FROM {source}
+        GROUP BY category, score / ?""", (SCORE_BUCKET, SCORE_BUCKET))
+    conn.execute("""
+        INSERT INTO score_histogram (category, bucket, games)
+        SELECT ?, bucket, SUM(games)
+        FROM score_histogram
+        GROUP BY bucket""", (ALL_CATEGORIES,))
+    conn.execute(f"""
+        INSERT INTO results_daily (day, user_id, category, games, total_score, best_score)
+        SELECT played_ts / {SECONDS_PER_DAY}, user_id, category, COUNT(*), SUM(score), MAX(score)
+        FROM {source}
+        GROUP BY played_ts / {SECONDS_PER_DAY}, user_id, category""")
+    conn.execute(f"""
+        INSERT INTO results_weekly (week, user_id, category, games, total_score, best_score)
+        SELECT (day + 3) / 7, user_id, category, SUM(games), SUM(total_score), MAX(best_score)
+        FROM results_daily
+        GROUP BY (day + 3) / 7, user_id, category""")
+
+
+# Оставить в archived_top только игры, которые могут попасть в top-LEADERBOARD_K
+# своей категории или всех категорий (остальные уже вытеснены лучшими архивными)
+_PRUNE_ARCHIVED_TOP_SQL = """
+    DELETE FROM archived_top WHERE result_id NOT IN (
+        SELECT result_id FROM (
+            SELECT result_id, ROW_NUMBER() OVER (PARTITION BY category ORDER BY score DESC, played_at) AS n
+            FROM archived_top)
+        WHERE n <= ?
+        UNION
+        SELECT result_id FROM (SELECT result_id FROM archived_top ORDER BY score DESC, played_at LIMIT ?))"""
+
+
+def _add_archived_top(conn: sqlite3.Connection, source: str) -> None:
+    """Добавить в archived_top лучшие игры из source (выражение FROM с колонками results)."""
+    conn.execute(f"""
+        INSERT OR REPLACE INTO archived_top (result_id, user_id, category, score, played_at)
+        SELECT id, user_id, category, score, played_at FROM {source}""")
+    conn.execute(_PRUNE_ARCHIVED_TOP_SQL, (LEADERBOARD_K, LEADERBOARD_K))
+
+
+def _rebuild_archived_top(conn: sqlite3.Connection) -> None:
+    """Собрать archived_top заново по подключённой архивной базе."""
+    conn.execute("DELETE FROM archived_top")
+    _add_archived_top(conn, "archive.results")
+
+
+def _rebuild_answer_stats(conn: sqlite3.Connection, include_archive: bool = False) -> None:
+    """Пересчитать question_stats и user_skill по answers (категория — из results игры)."""
+    answers = "SELECT a.question_id, a.user_id, a.is_correct, r.category FROM {0}.answers a JOIN {0}.results r ON r.id = a.result_id"
+    source = f"({answers.format('main')})"
+    if include_archive:
+        source = f"({answers.format('main')} UNION ALL {answers.format('archive')})"
+    conn.execute("DELETE FROM question_stats")
+    conn.execute("DELETE FROM user_skill")
+    conn.execute(f"""
+        INSERT INTO question_stats (question_id, attempts, correct)
+        SELECT question_id, COUNT(*), SUM(is_correct) FROM {source}
+        WHERE question_id IN (SELECT id FROM questions)
+        GROUP BY question_id""")
+    conn.execute(f"""
+        INSERT INTO user_skill (user_id, category, attempts, correct)
+        SELECT user_id, category, COUNT(*), SUM(is_correct) FROM {source} GROUP BY user_id, category""")
+
+
+def backfill_history(conn: sqlite3.Connection) -> None:
+    """Собрать по истории user_seen и review_queue, полнотекстовый и LSH-индексы (без commit).
+
+    Миграции 11, 13 и 14 только создают таблицы: перенос истории на большой
+    базе долгий и не должен задерживать старт приложения. user_seen
+    и review_queue собираются заново — категории, сброшенные игроком, снова
+    считаются виденными.
+    """
+    _create_fts_triggers(conn)
+    conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+    _rebuild_user_seen(conn)
+    _rebuild_review_queue(conn)
+    update_question_signatures(conn)
+
+
+def _rebuild_user_seen(conn: sqlite3.Connection, chunk_size: int = IMPORT_CHUNK_SIZE) -> None:
+    """Собрать user_seen по answers: множества по игроку и категории, в памяти — одно за раз."""
+    conn.execute("DELETE FROM user_seen")
+    cur = conn.execute("""
+        SELECT DISTINCT r.user_id, r.category, a.question_id
+        FROM answers a JOIN results r ON r.id = a.result_id
+        WHERE a.question_id IN (SELECT id FROM questions)
+        ORDER BY r.user_id, r.category""")
+    key = None
+    seen = SeenSet()
+    pending: List[Tuple[int, str, int, bytes]] = []
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        for user_id, category, question_id in rows:
+            if (user_id, category) != key:
+                if key is not None:
+                    pending.extend((*key, chunk, seen.chunk_bits(chunk)) for chunk in seen.take_dirty())
+                key = (user_id, category)
+                seen = SeenSet()
+            seen.add(question_id)
+        if not rows and key is not None:
+            pending.extend((*key, chunk, seen.chunk_bits(chunk)) for chunk in seen.take_dirty())
+        if pending:
+            conn.executemany("INSERT INTO user_seen (user_id, category, chunk, bits) VALUES (?, ?, ?, ?)", pending)
+            pending.clear()
+        if not rows:
+            break
+
+
+# Все ответы игроков с временем игры: обычные игры и повторения
+_REVIEW_HISTORY = """(
+    SELECT r.user_id, a.question_id, r.played_ts, a.is_correct FROM answers a JOIN results r ON r.id = a.result_id
+    UNION ALL
+    SELECT user_id, question_id, played_ts, is_correct FROM review_answers)"""
+
+
+def _rebuild_review_queue(conn: sqlite3.Connection) -> None:
+    """Собрать review_queue по answers и review_answers тем же расписанием, что и review.write_reviews.
+
+    Состояние вопроса зависит только от последнего неверного ответа (он ставит
+    интервал FIRST_INTERVAL_SEC) и следующих за ним верных: каждый шаг
+    рекурсии берёт первый верный ответ не раньше срока и удваивает интервал.
+    Вопрос, интервал которого превысил MAX_INTERVAL_SEC, в очередь не попадает.
+    """
+    conn.execute("DELETE FROM review_queue")
+    conn.execute("""
+        CREATE TEMP TABLE review_correct (
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            played_ts INTEGER NOT NULL,
+            PRIMARY KEY (user_id, question_id, played_ts)
+        ) WITHOUT ROWID""")
     try:
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            avatar_path TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )""")
+        conn.execute(f"""
+            INSERT OR IGNORE INTO review_correct (user_id, question_id, played_ts)
+            SELECT user_id, question_id, played_ts FROM {_REVIEW_HISTORY} WHERE is_correct""")
+        conn.execute(f"""
+            INSERT INTO review_queue (user_id, question_id, due_ts, interval_sec)
+            WITH RECURSIVE schedule (user_id, question_id, due_ts, interval_sec) AS (
+                SELECT user_id, question_id, MAX(played_ts) + ?, ?
+                FROM {_REVIEW_HISTORY}
+                WHERE NOT is_correct
+                GROUP BY user_id, question_id
+                UNION ALL
+                SELECT s.user_id, s.question_id, c.played_ts + s.interval_sec * 2, s.interval_sec * 2
+                FROM schedule s JOIN review_correct c
+                    ON c.user_id = s.user_id AND c.question_id = s.question_id
+                   AND c.played_ts = (SELECT MIN(played_ts) FROM review_correct
+                                      WHERE user_id = s.user_id AND question_id = s.question_id
+                                        AND played_ts >= s.due_ts)
+                WHERE s.interval_sec <= ?
+            )
+            SELECT user_id, question_id, due_ts, MAX(interval_sec) FROM schedule
+            WHERE question_id IN (SELECT id FROM questions)
+            GROUP BY user_id, question_id
+            HAVING MAX(interval_sec) <= ?""",
+            (FIRST_INTERVAL_SEC, FIRST_INTERVAL_SEC, MAX_INTERVAL_SEC, MAX_INTERVAL_SEC))
+    finally:
+        conn.execute("DROP TABLE temp.review_correct")
+
+
+def rescore_results(conn: sqlite3.Connection, schema: str = "main",
+                    chunk_size: int = 100_000) -> Tuple[int, int]:
+    """Пересчитать results.score по журналу answers текущими правилами scoring (без commit).
+
+    Ответы читаются по chunk_size строк и считаются пачкой (scoring.game_totals);
+    игры без записанных ответов не меняются. Сводные таблицы после этого
+    нужно пересчитать (_rebuild_result_rollups). Возвращает (игр пересчитано, игр изменилось).
+    """
+    cur = conn.execute(f"SELECT result_id, is_correct, time_spent_sec FROM {schema}.answers ORDER BY result_id")
+    update_sql = f"UPDATE {schema}.results SET score = ? WHERE id = ? AND score != ?"
+    changes_before = conn.total_changes
+    games = 0
+    pending: List[Tuple[int, int, float]] = []
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        done = not rows
+        rows = pending + rows
+        pending = []
+        if not done and rows:
+            # Последняя игра пачки может продолжаться в следующей — переносим её целиком
+            split = len(rows) - 1
+            while split > 0 and rows[split - 1][0] == rows[-1][0]:
+                split -= 1
+            if split > 0:
+                rows, pending = rows[:split], rows[split:]
+            else:
+                pending, rows = rows, []
+        if rows:
+            result_ids, correct, time_spent = zip(*rows)
+            ids, totals = game_totals(result_ids, correct, time_spent)
+            conn.executemany(update_sql, [(total, result_id, total) for result_id, total in zip(ids, totals)])
+            games += len(ids)
+        if done:
+            break
+    _bump_results_version(conn)
+    return games, conn.total_changes - changes_before
+
+
+def archive_results(db_path: Path, archive_path: Path, older_than_days: int,
+                    batch_size: int = 50_000) -> int:
+    """Перенести игры старше older_than_days (и их ответы) в отдельный файл базы.
 
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Сводные таблицы не меняются, поэтому статистика остаётся точной.
+    Перенос идёт пачками по batch_size строк — каждая в своей транзакции,
+    чтобы не держать блокировку записи надолго. Возвращает число перенесённых игр.
+    """
+    cutoff = int(time.time()) - older_than_days * SECONDS_PER_DAY
+    conn = get_connection(db_path)
+    moved = 0
+    try:
+        conn.execute("ATTACH DATABASE ? AS archive", (str(archive_path),))
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.results (
+            id INTEGER PRIMARY KEY,
             user_id INTEGER NOT NULL,
             category TEXT NOT NULL,
             score INTEGER NOT NULL,
             duration_sec INTEGER NOT NULL,
-            played_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            played_at TEXT,
+            played_ts INTEGER
         )""")
-
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            category TEXT NOT NULL,
-            text TEXT NOT NULL,
-            option1 TEXT NOT NULL,
-            option2 TEXT NOT NULL,
-            option3 TEXT NOT NULL,
-            option4 TEXT NOT NULL,
-            correct_index INTEGER NOT NULL CHECK (correct_index BETWEEN 0 AND 3)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.answers (
+            id INTEGER PRIMARY KEY,
+            result_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            selected_index INTEGER,
+            is_correct INTEGER NOT NULL,
+            time_spent_sec REAL NOT NULL
         )""")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)")
+        _backfill_played_ts(conn)
+        conn.commit()
 
-        # Убираем уникальный индекс на имя - разрешаем одинаковые имена
-        # cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_users_name ON users(name)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_results_user ON results(user_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_results_category ON results(category)")
+        while True:
+            conn.execute("DELETE FROM archive_batch")
+            conn.execute("""
+                INSERT INTO archive_batch (id)
+                SELECT id FROM results WHERE played_ts < ? LIMIT ?""", (cutoff, batch_size))
+            count = conn.execute("SELECT COUNT(*) FROM archive_batch").fetchone()[0]
+            if not count:
+                conn.commit()
+                break
+            conn.execute("""
+                INSERT INTO archive.results (id, user_id, category, score, duration_sec, played_at, played_ts)
+                SELECT id, user_id, category, score, duration_sec, played_at, played_ts
+                FROM results WHERE id IN (SELECT id FROM archive_batch)""")
+            # Лучшие из переносимых игр остаются в основной базе для досок «за всё время»
+            _add_archived_top(conn, "results WHERE id IN (SELECT id FROM archive_batch)")
+            conn.execute("""
+                INSERT INTO archive.answers (id, result_id, user_id, question_id, selected_index, is_correct, time_spent_sec)
+                SELECT id, result_id, user_id, question_id, selected_index, is_correct, time_spent_sec
+                FROM answers WHERE result_id IN (SELECT id FROM archive_batch)""")
+            conn.execute("DELETE FROM answers WHERE result_id IN (SELECT id FROM archive_batch)")
+            conn.execute("DELETE FROM results WHERE id IN (SELECT id FROM archive_batch)")
+            _bump_results_version(conn)
+            conn.commit()
+            moved += count
 
-        cur.execute("SELECT COUNT(*) FROM questions")
-        count = cur.fetchone()[0]
+        conn.execute("DETACH DATABASE archive")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-        if count > 0:
-            print("[INFO] Questions table not empty, seeding skipped.")
-            conn.commit()
-            return
+    print(f"[INFO] Archived {moved} results older than {older_than_days} days to {archive_path}")
+    return moved
 
-        seed_file = db_path.parent / "seed_questions.csv"
 
-        if not seed_file.exists():
-            print(f"[WARNING] The file {seed_file} was not found. Question loading will be skipped.")
-            conn.commit()
-            return
+@contextmanager
+def deferred_indexes(conn: sqlite3.Connection, table: str, triggers: bool = False) -> Iterator[None]:
+    """Удалить вторичные индексы (и, если нужно, триггеры) таблицы и создать их заново в конце.
 
-        inserted = 0
+    Построить индекс один раз по готовым данным быстрее, чем обновлять его на каждой вставке.
+    Вызывать внутри транзакции: при откате удалённые объекты вернутся.
+    """
+    types = ("index", "trigger") if triggers else ("index",)
+    placeholders = ", ".join("?" * len(types))
+    objects = conn.execute(
+        f"SELECT type, name, sql FROM sqlite_master WHERE tbl_name = ? AND type IN ({placeholders}) AND sql IS NOT NULL",
+        (table, *types)
+    ).fetchall()
+    for obj_type, name, _ in objects:
+        conn.execute(f"DROP {obj_type.upper()} IF EXISTS {name}")
+    yield
+    for _, _, sql in objects:
+        conn.execute(sql)
 
-        with open(seed_file, encoding="utf-8", newline="") as f:
-            reader = csv.DictReader(f)
 
-            # Проверка заголовка CSV
-            expected_header = ["category", "text", "option1", "option2", "option3", "option4", "correct_index"]
-            if reader.fieldnames != expected_header:
-                raise ValueError(f"Invalid CSV header. Expected: {expected_header}, Got: {reader.fieldnames}")
+def iter_question_rows(csv_path: Path, report: Dict[str, Any]) -> Iterator[Tuple[Any, ...]]:
+    """Потоково читать вопросы из CSV, пропуская некорректные строки.
 
-            for row in reader:
-                # Проверка на пустые значения
-                if (not row.get('category') or not row.get('text') or
-                        not row.get('option1') or not row.get('option2') or
-                        not row.get('option3') or not row.get('option4') or
-                        not row.get('correct_index')):
-                    print(f"[WARNING] Empty values in row skipped: {row}")
-                    continue
+    Пропуски считаются в report["skipped"], описания ошибок добавляются в
+    report["errors"] (не больше MAX_REPORTED_ERRORS), а не печатаются —
+    при миллионах строк вывод в консоль дороже самой вставки.
+    """
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        # Проверка заголовка CSV
+        if header != QUESTION_CSV_HEADER:
+            raise ValueError(f"Invalid CSV header. Expected: {QUESTION_CSV_HEADER}, Got: {header}")
 
+        for line_no, row in enumerate(reader, start=2):
+            error = None
+            # Проверка на пустые значения
+            if len(row) != 7 or not all(row):
+                error = "empty values"
+            else:
                 # Валидация correct_index
                 try:
-                    ci = int(row["correct_index"])
-                    if ci not in {0, 1, 2, 3}:
-                        print(f"[SKIP] invalid correct_index: {ci}, row={row}")
-                        continue
+                    ci = int(row[6])
+                    if ci not in (0, 1, 2, 3):
+                        error = f"invalid correct_index: {ci}"
                 except ValueError:
-                    print(f"[SKIP] non-integer correct_index: {row['correct_index']}, row={row}")
-                    continue
-
-                # Вставка вопроса
-                cur.execute("""
-                        INSERT INTO questions (category, text, option1, option2, option3, option4, correct_index)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """, (row["category"], row["text"],
-                              row["option1"], row["option2"], row["option3"], row["option4"],
-                              ci))
-                inserted += 1
-
-        print(f"[INFO] Seeded {inserted} questions from {seed_file}")
+                    error = f"non-integer correct_index: {row[6]}"
+
+            if error is not None:
+                report["skipped"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append(f"line {line_no}: {error}")
+                continue
+
+            yield (row[0], row[1], row[2], row[3], row[4], row[5], ci)
+
+
+def import_questions(conn: sqlite3.Connection, csv_path: Path,
+                     chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+    """Массовый импорт вопросов из CSV одной транзакцией.
+
+    Строки читаются потоково и вставляются пачками executemany; на время импорта
+    включаются быстрые прагмы, а индексы и триггеры questions создаются заново
+    после вставки (счётчик bank_version увеличивается один раз).
+    Новые строки добавляются в полнотекстовый индекс одним запросом и проверяются
+    на почти-дубликаты уже имеющихся вопросов (update_question_signatures).
+    Возвращает отчёт: inserted, near_duplicates, skipped, errors, elapsed_sec, rows_per_sec.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+    report: Dict[str, Any] = {"inserted": 0, "near_duplicates": [], "skipped": 0, "errors": []}
+    inserted = 0
+    started = time.perf_counter()
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -200000")
+    if journal_mode != "wal":
+        conn.execute("PRAGMA journal_mode = MEMORY")
+    try:
+        conn.execute("BEGIN")
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+        with deferred_indexes(conn, "questions", triggers=True):
+            chunk = []
+            for row in iter_question_rows(csv_path, report):
+                chunk.append(row + question_hashes(row))
+                if len(chunk) >= chunk_size:
+                    conn.executemany(INSERT_QUESTION_SQL, chunk)
+                    inserted += len(chunk)
+                    chunk.clear()
+            if chunk:
+                conn.executemany(INSERT_QUESTION_SQL, chunk)
+                inserted += len(chunk)
+        if inserted:
+            # Триггеры FTS были сняты вместе с остальными — индексируем новые строки разом
+            conn.execute("""
+                INSERT INTO questions_fts (rowid, text, option1, option2, option3, option4)
+                SELECT id, text, option1, option2, option3, option4 FROM questions WHERE id > ?""", (last_id,))
+            report["near_duplicates"] = update_question_signatures(conn, detect_after_id=last_id)
+            conn.execute("UPDATE bank_version SET version = version + 1 WHERE id = 1")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        conn.execute(f"PRAGMA cache_size = {cache_size}")
+        if journal_mode != "wal":
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+    elapsed = time.perf_counter() - started
+    report["inserted"] = inserted
+    report["elapsed_sec"] = round(elapsed, 3)
+    report["rows_per_sec"] = inserted / elapsed if elapsed else 0.0
+    return report
+
+
+def _backfill_question_hashes(conn: sqlite3.Connection, chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+    """Посчитать key_hash/content_hash для вопросов, добавленных в обход import_questions.
+
+    Оба хэша пишутся вместе, поэтому «есть ли что считать» проверяется по
+    key_hash IS NULL через idx_questions_key — обычная синхронизация не читает
+    таблицу целиком. Строки идут пачками по id (keyset): в памяти не больше
+    chunk_size вопросов.
+    """
+    if conn.execute("SELECT 1 FROM questions WHERE key_hash IS NULL LIMIT 1").fetchone() is None:
+        return 0
+    backfilled = 0
+    last_id = 0
+    with deferred_indexes(conn, "questions", triggers=True):
+        while True:
+            rows = conn.execute("""
+                SELECT id, category, text, option1, option2, option3, option4, correct_index
+                FROM questions WHERE id > ? AND key_hash IS NULL ORDER BY id LIMIT ?""",
+                (last_id, chunk_size)).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                "UPDATE questions SET key_hash = ?, content_hash = ? WHERE id = ?",
+                [question_hashes(row[1:]) + (row[0],) for row in rows]
+            )
+            backfilled += len(rows)
+            last_id = rows[-1][0]
+    conn.execute("UPDATE bank_version SET version = version + 1 WHERE id = 1")
+    return backfilled
+
+
+def update_question_signatures(conn: sqlite3.Connection, detect_after_id: Optional[int] = None,
+                               threshold: float = DUPLICATE_THRESHOLD,
+                               chunk_size: int = IMPORT_CHUNK_SIZE) -> List[Tuple[int, int, float]]:
+    """Досчитать LSH-сигнатуры вопросов, которых ещё нет в question_lsh (без commit).
+
+    Вопросы с id > detect_after_id (новые строки импорта) перед добавлением
+    в индекс сравниваются с уже проиндексированными, в том числе с новыми
+    строками той же пачки; похожие (Жаккар >= threshold) записываются
+    в question_duplicates. Возвращает найденные пары (question_id, similar_id, similarity).
+    """
+    last_indexed = conn.execute("SELECT COALESCE(MAX(question_id), 0) FROM question_lsh").fetchone()[0]
+    rows = conn.execute("SELECT id, text FROM questions WHERE id > ? ORDER BY id", (last_indexed,))
+    duplicates: List[Tuple[int, int, float]] = []
+    while True:
+        chunk = rows.fetchmany(chunk_size)
+        if not chunk:
+            break
+        lsh_rows = []
+        # Корзины текущей пачки: её строки ещё не записаны в question_lsh
+        chunk_buckets: Dict[int, List[int]] = {}
+        # Шинглы новых строк и уже прочитанных кандидатов: первые строки
+        # «популярных» корзин попадаются в кандидатах снова и снова
+        chunk_shingles: Dict[int, frozenset] = {}
+        for question_id, text in chunk:
+            text_shingles = shingles(text)
+            buckets = lsh_buckets(text_shingles)
+            if detect_after_id is not None and question_id > detect_after_id:
+                candidates = dict.fromkeys(similar_candidates(conn, buckets))
+                for bucket in buckets:
+                    candidates.update(dict.fromkeys(chunk_buckets.get(bucket, ())[-MAX_BUCKET_CANDIDATES:]))
+                known = {i: chunk_shingles[i] for i in candidates if i in chunk_shingles}
+                unknown = [i for i in candidates if i not in known]
+                if unknown:
+                    placeholders = ", ".join("?" * len(unknown))
+                    for similar_id, similar_text in conn.execute(
+                            f"SELECT id, text FROM questions WHERE id IN ({placeholders})", unknown):
+                        known[similar_id] = chunk_shingles[similar_id] = shingles(similar_text)
+                for similar_id, other in known.items():
+                    similarity = jaccard(text_shingles, other)
+                    if similarity >= threshold:
+                        duplicates.append((question_id, similar_id, round(similarity, 3)))
+                chunk_shingles[question_id] = text_shingles
+            for bucket in buckets:
+                chunk_buckets.setdefault(bucket, []).append(question_id)
+                lsh_rows.append((bucket, question_id))
+        # В порядке ключа вставка идёт по соседним страницам индекса
+        lsh_rows.sort()
+        conn.executemany("INSERT OR IGNORE INTO question_lsh (bucket, question_id) VALUES (?, ?)", lsh_rows)
+    if duplicates:
+        conn.executemany("""
+            INSERT OR REPLACE INTO question_duplicates (question_id, similar_id, similarity)
+            VALUES (?, ?, ?)""", duplicates)
+    return duplicates
+
+
+def sync_questions(conn: sqlite3.Connection, csv_path: Path, retire_missing: bool = False,
+                   chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+    """Инкрементально применить пакет вопросов: добавить новые, обновить изменённые.
+
+    Вопрос узнаётся по key_hash (категория + текст), изменение — по content_hash.
+    Пакет загружается во временную таблицу, дальше всё делают три запроса
+    по покрывающему индексу idx_questions_key (key_hash, content_hash),
+    поэтому пишутся только отличающиеся строки.
+    retire_missing=True переносит в retired_questions вопросы тех категорий пакета,
+    которых в пакете больше нет (история ответов на них сохраняется, а из очереди
+    повторения, question_stats и user_seen они убираются).
+    Добавленные вопросы проверяются на почти-дубликаты (report["near_duplicates"]).
+    """
+    if conn.in_transaction:
+        conn.commit()
+    report: Dict[str, Any] = {"inserted": 0, "updated": 0, "unchanged": 0, "retired": 0,
+                              "near_duplicates": [], "skipped": 0, "errors": []}
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    temp_store = conn.execute("PRAGMA temp_store").fetchone()[0]
+    started = time.perf_counter()
+    # Временная таблица пакета целиком в памяти
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -200000")
+    try:
+        conn.execute("BEGIN")
+        report["backfilled"] = _backfill_question_hashes(conn)
+
+        conn.execute("DROP TABLE IF EXISTS temp.pack")
+        conn.execute("""
+            CREATE TEMP TABLE pack (
+                category TEXT, text TEXT, option1 TEXT, option2 TEXT, option3 TEXT, option4 TEXT,
+                correct_index INTEGER, key_hash TEXT, content_hash TEXT
+            )""")
+        chunk = []
+        for row in iter_question_rows(csv_path, report):
+            chunk.append(row + question_hashes(row))
+            if len(chunk) >= chunk_size:
+                conn.executemany("INSERT INTO pack VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+                chunk.clear()
+        if chunk:
+            conn.executemany("INSERT INTO pack VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+        # Индекс строим после загрузки (один проход сортировки), повторы ключа — побеждает последний
+        conn.execute("CREATE INDEX temp.idx_pack_key ON pack(key_hash, content_hash)")
+        has_duplicates = conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM pack GROUP BY key_hash HAVING COUNT(*) > 1)").fetchone()[0]
+        if has_duplicates:
+            conn.execute("""
+                DELETE FROM pack WHERE rowid NOT IN (SELECT MAX(rowid) FROM pack GROUP BY key_hash)""")
+        pack_rows = conn.execute("SELECT COUNT(*) FROM pack").fetchone()[0]
+
+        report["updated"] = conn.execute("""
+            UPDATE questions
+            SET option1 = pack.option1, option2 = pack.option2, option3 = pack.option3,
+                option4 = pack.option4, correct_index = pack.correct_index, content_hash = pack.content_hash
+            FROM pack
+            WHERE questions.key_hash = pack.key_hash AND questions.content_hash != pack.content_hash""").rowcount
+
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+        report["inserted"] = conn.execute("""
+            INSERT INTO questions (category, text, option1, option2, option3, option4, correct_index, key_hash, content_hash)
+            SELECT category, text, option1, option2, option3, option4, correct_index, key_hash, content_hash
+            FROM pack
+            WHERE NOT EXISTS (SELECT 1 FROM questions q WHERE q.key_hash = pack.key_hash)""").rowcount
+
+        if retire_missing:
+            conn.execute("DROP TABLE IF EXISTS temp.retired")
+            conn.execute("CREATE TEMP TABLE retired (id INTEGER PRIMARY KEY, category TEXT NOT NULL)")
+            conn.execute("""
+                INSERT INTO retired (id, category)
+                SELECT id, category FROM questions
+                WHERE category IN (SELECT DISTINCT category FROM pack)
+                  AND NOT EXISTS (SELECT 1 FROM pack WHERE pack.key_hash = questions.key_hash)""")
+            conn.execute("""
+                INSERT OR REPLACE INTO retired_questions
+                    (id, category, text, option1, option2, option3, option4, correct_index,
+                     key_hash, content_hash, retired_at)
+                SELECT id, category, text, option1, option2, option3, option4, correct_index,
+                       key_hash, content_hash, CAST(strftime('%s', 'now') AS INTEGER)
+                FROM questions WHERE id IN (SELECT id FROM retired)""")
+            report["retired"] = conn.execute(
+                "DELETE FROM questions WHERE id IN (SELECT id FROM retired)").rowcount
+            # Ответы остаются в истории, а очередь, счётчики и виденные вопросы игроков — только для банка
+            conn.execute("DELETE FROM review_queue WHERE question_id IN (SELECT id FROM retired)")
+            conn.execute("DELETE FROM question_stats WHERE question_id IN (SELECT id FROM retired)")
+            retired: Dict[str, List[int]] = {}
+            for question_id, category in conn.execute("SELECT id, category FROM retired"):
+                retired.setdefault(category, []).append(question_id)
+            for category, question_ids in retired.items():
+                remove_seen(conn, category, question_ids)
+            conn.execute("DROP TABLE temp.retired")
+
+        report["near_duplicates"] = update_question_signatures(conn, detect_after_id=last_id)
+        report["unchanged"] = pack_rows - report["inserted"] - report["updated"]
+        conn.execute("DROP TABLE temp.pack")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute(f"PRAGMA cache_size = {cache_size}")
+        conn.execute(f"PRAGMA temp_store = {temp_store}")
+
+    report["elapsed_sec"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def _print_near_duplicates(report: Dict[str, Any], limit: int = 5) -> None:
+    duplicates = report["near_duplicates"]
+    if not duplicates:
+        return
+    flagged = len({question_id for question_id, _, _ in duplicates})
+    print(f"[WARNING] {flagged} new questions look like existing ones (see table question_duplicates)")
+    for question_id, similar_id, similarity in duplicates[:limit]:
+        print(f"[WARNING]   #{question_id} ~ #{similar_id} (similarity {similarity})")
+
+
+def _print_import_errors(report: Dict[str, Any], limit: int = 5) -> None:
+    if not report["skipped"]:
+        return
+    print(f"[WARNING] Skipped {report['skipped']} invalid rows")
+    for error in report["errors"][:limit]:
+        print(f"[WARNING]   {error}")
+    if report["skipped"] > limit:
+        print(f"[WARNING]   ... and {report['skipped'] - limit} more")
+
+
+# ====== Миграции схемы ======
+# Каждый шаг идемпотентен (IF NOT EXISTS, проверка колонок): базы, созданные
+# прежними версиями init_database, уже могут содержать часть объектов.
+# Номер последнего применённого шага хранится в PRAGMA user_version.
+
+# Подсказки, уже выведенные в этом процессе (одна на команду)
+_printed_hints = set()
+
+
+def _hint_backfill(conn: sqlite3.Connection, table: str, option: str) -> None:
+    """Миграции не переносят историю при старте: подсказать команду, если в table есть строки."""
+    if option in _printed_hints:
+        return
+    if conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]:
+        _printed_hints.add(option)
+        print(f"[INFO] Existing data is not migrated at startup: run scripts/init_db.py {option}")
+
+
+def _migration_base_schema(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        avatar_path TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        duration_sec INTEGER NOT NULL,
+        played_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )""")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS questions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category TEXT NOT NULL,
+        text TEXT NOT NULL,
+        option1 TEXT NOT NULL,
+        option2 TEXT NOT NULL,
+        option3 TEXT NOT NULL,
+        option4 TEXT NOT NULL,
+        correct_index INTEGER NOT NULL CHECK (correct_index BETWEEN 0 AND 3)
+    )""")
+
+    # Убираем уникальный индекс на имя - разрешаем одинаковые имена
+    # conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_users_name ON users(name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_user ON results(user_id)")
+
+
+def _migration_questions_category_index(conn: sqlite3.Connection) -> None:
+    # Индекс для выборки вопросов по категории (start_game, list_categories)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_category ON questions(category)")
+
+
+def _migration_bank_version(conn: sqlite3.Connection) -> None:
+    # Счётчик версии банка вопросов: по нему кэши в quiz.py узнают об изменениях
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS bank_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""")
+    conn.execute("INSERT OR IGNORE INTO bank_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_questions_{event.lower()}_version
+        AFTER {event} ON questions
+        BEGIN
+            UPDATE bank_version SET version = version + 1 WHERE id = 1;
+        END""")
+
+
+def _migration_user_stats(conn: sqlite3.Connection) -> None:
+    # Сводная статистика игроков: обновляется вместе с записью results (user.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        games INTEGER NOT NULL DEFAULT 0,
+        total_score INTEGER NOT NULL DEFAULT 0,
+        best_score INTEGER NOT NULL DEFAULT 0,
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    )""")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_category_stats (
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        games INTEGER NOT NULL DEFAULT 0,
+        total_score INTEGER NOT NULL DEFAULT 0,
+        best_score INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, category),
+        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ) WITHOUT ROWID""")
+
+
+def _migration_answers(conn: sqlite3.Connection) -> None:
+    # Ответы на отдельные вопросы: пишутся одной пачкой в конце игры
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS answers (
+        id INTEGER PRIMARY KEY,
+        result_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        selected_index INTEGER,
+        is_correct INTEGER NOT NULL,
+        time_spent_sec REAL NOT NULL
+    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_question ON answers(question_id, is_correct)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_user ON answers(user_id, question_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_result ON answers(result_id)")
+
+
+def _migration_leaderboard_indexes(conn: sqlite3.Connection) -> None:
+    # Покрывающие индексы для лидербордов: top-K читается из индекса без сортировки.
+    # Индекс по (category, score, ...) заменяет прежний idx_results_category
+    conn.execute("DROP INDEX IF EXISTS idx_results_category")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_results_category_score
+                    ON results(category, score DESC, played_at, user_id)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_results_score
+                    ON results(score DESC, played_at, user_id)""")
+
+
+def _migration_score_histogram(conn: sqlite3.Connection) -> None:
+    # Гистограммы очков по категориям (category = '*' — все игры) для перцентилей
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS score_histogram (
+        category TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        games INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (category, bucket)
+    ) WITHOUT ROWID""")
+
+
+def _migration_played_ts(conn: sqlite3.Connection) -> None:
+    # Время игры в секундах Unix: played_at (локальное ISO-время) не индексировалось
+    if not _has_column(conn, "results", "played_ts"):
+        conn.execute("ALTER TABLE results ADD COLUMN played_ts INTEGER")
+    # Старые игры получают played_ts в --rebuild-stats (_backfill_played_ts)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_results_played ON results(played_ts)")
+    _hint_backfill(conn, "results", "--rebuild-stats")
+
+    # Сводки по дням и неделям (day = played_ts / 86400, неделя с понедельника: (day + 3) / 7)
+    for period, table in (("day", "results_daily"), ("week", "results_weekly")):
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            {period} INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            best_score INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY ({period}, user_id, category)
+        ) WITHOUT ROWID""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table}(user_id, {period})")
+
+
+def _migration_question_hashes(conn: sqlite3.Connection) -> None:
+    # Хэши для инкрементального обновления пакетов вопросов (sync_questions)
+    for column in ("key_hash", "content_hash"):
+        if not _has_column(conn, "questions", column):
+            conn.execute(f"ALTER TABLE questions ADD COLUMN {column} TEXT")
+    # content_hash в индексе: неизменённые вопросы отсеиваются без чтения строк таблицы
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_key ON questions(key_hash, content_hash)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS retired_questions (
+        id INTEGER PRIMARY KEY,
+        category TEXT NOT NULL,
+        text TEXT NOT NULL,
+        option1 TEXT NOT NULL,
+        option2 TEXT NOT NULL,
+        option3 TEXT NOT NULL,
+        option4 TEXT NOT NULL,
+        correct_index INTEGER NOT NULL,
+        key_hash TEXT,
+        content_hash TEXT,
+        retired_at INTEGER NOT NULL
+    )""")
+
+
+def _migration_backfill_rollups(conn: sqlite3.Connection) -> None:
+    # Сводки по уже накопленным results собирает --rebuild-stats; до тех пор
+    # статистика учитывает только новые игры
+    _hint_backfill(conn, "results", "--rebuild-stats")
+
+
+def _create_fts_triggers(conn: sqlite3.Connection) -> None:
+    """Триггеры, которые поддерживают questions_fts вслед за questions."""
+    fts_columns = "text, option1, option2, option3, option4"
+    new_values = "new.id, new.text, new.option1, new.option2, new.option3, new.option4"
+    old_values = "'delete', old.id, old.text, old.option1, old.option2, old.option3, old.option4"
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_insert AFTER INSERT ON questions
+    BEGIN
+        INSERT INTO questions_fts (rowid, {fts_columns}) VALUES ({new_values});
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_delete AFTER DELETE ON questions
+    BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, {fts_columns}) VALUES ({old_values});
+    END""")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_questions_fts_update
+    AFTER UPDATE OF {fts_columns} ON questions
+    BEGIN
+        INSERT INTO questions_fts (questions_fts, rowid, {fts_columns}) VALUES ({old_values});
+        INSERT INTO questions_fts (rowid, {fts_columns}) VALUES ({new_values});
+    END""")
+
+
+def _migration_question_search(conn: sqlite3.Connection) -> None:
+    # Полнотекстовый индекс по тексту и вариантам (external content: строки хранятся только в questions)
+    conn.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+        text, option1, option2, option3, option4,
+        content='questions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""")
+    if conn.execute("SELECT EXISTS (SELECT 1 FROM questions)").fetchone()[0]:
+        # Индекс имеющихся вопросов вместе с триггерами строит --backfill-history
+        # (удаление из FTS строки, которой нет в индексе, портит индекс)
+        _hint_backfill(conn, "questions", "--backfill-history")
+    else:
+        _create_fts_triggers(conn)
+
+    # LSH-индекс MinHash-сигнатур (search.py) и найденные при импорте почти-дубликаты.
+    # Строки удалённых вопросов не чистятся: кандидаты проверяются по questions
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS question_lsh (
+        bucket INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        PRIMARY KEY (bucket, question_id)
+    ) WITHOUT ROWID""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS question_duplicates (
+        question_id INTEGER NOT NULL,
+        similar_id INTEGER NOT NULL,
+        similarity REAL NOT NULL,
+        PRIMARY KEY (question_id, similar_id)
+    ) WITHOUT ROWID""")
+    # Сигнатуры имеющихся вопросов досчитывают импорт, синхронизация и --backfill-history
+
+
+def _migration_answer_stats(conn: sqlite3.Connection) -> None:
+    # Счётчики ответов по вопросам и по игрокам в категориях для адаптивного выбора (selection.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS question_stats (
+        question_id INTEGER PRIMARY KEY,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0
+    )""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_skill (
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        correct INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, category)
+    ) WITHOUT ROWID""")
+    # Счётчики по уже записанным ответам собирает --rebuild-stats
+    _hint_backfill(conn, "answers", "--rebuild-stats")
+
+
+def _migration_user_seen(conn: sqlite3.Connection) -> None:
+    # Виденные игроками вопросы: блоки roaring-подобных множеств id (seen.py)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_seen (
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        chunk INTEGER NOT NULL,
+        bits BLOB NOT NULL,
+        PRIMARY KEY (user_id, category, chunk)
+    ) WITHOUT ROWID""")
+    _hint_backfill(conn, "answers", "--backfill-history")
+
+
+def _migration_review_queue(conn: sqlite3.Connection) -> None:
+    # Очередь повторения ошибок (review.py); индекс по сроку — очередь с приоритетом для игрока
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS review_queue (
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        due_ts INTEGER NOT NULL,
+        interval_sec INTEGER NOT NULL,
+        PRIMARY KEY (user_id, question_id)
+    ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_due ON review_queue(user_id, due_ts)")
+    _hint_backfill(conn, "answers", "--backfill-history")
+
+
+def _migration_archived_top(conn: sqlite3.Connection) -> None:
+    # Лучшие игры, перенесённые в архив: доски «за всё время» читают их вместе с results.
+    # Для уже архивированной базы заполняется через --rebuild-stats --archive
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS archived_top (
+        result_id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        score INTEGER NOT NULL,
+        played_at TEXT
+    )""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_archived_top_category_score
+                    ON archived_top(category, score DESC, played_at, user_id)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_archived_top_score
+                    ON archived_top(score DESC, played_at, user_id)""")
+
+
+def _migration_review_answers(conn: sqlite3.Connection) -> None:
+    # Ответы игр-повторений: в results и рейтинги они не попадают (review.write_review_answers)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS review_answers (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        question_id INTEGER NOT NULL,
+        selected_index INTEGER,
+        is_correct INTEGER NOT NULL,
+        time_spent_sec REAL NOT NULL,
+        played_ts INTEGER NOT NULL
+    )""")
+
+
+def _migration_results_version(conn: sqlite3.Connection) -> None:
+    # Счётчик правок results в обход UserProfile (rescore, rebuild, archive):
+    # по нему Leaderboard в запущенном приложении сбрасывает доски
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS results_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )""")
+    conn.execute("INSERT OR IGNORE INTO results_version (id, version) VALUES (1, 0)")
+
+
+def _migration_windowed_leaderboard_index(conn: sqlite3.Connection) -> None:
+    # Лидерборд за период (played_ts >= ?): покрывающий индекс по окну категории
+    # вместо прохода idx_results_category_score по всей категории
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_results_category_played
+                    ON results(category, played_ts, score DESC, played_at, user_id)""")
+
+
+# Порядок менять нельзя, новые шаги — только в конец списка
+MIGRATIONS = [
+    (1, "base schema", _migration_base_schema),
+    (2, "questions.category index", _migration_questions_category_index),
+    (3, "bank_version counter and triggers", _migration_bank_version),
+    (4, "user_stats rollups", _migration_user_stats),
+    (5, "answers log", _migration_answers),
+    (6, "leaderboard covering indexes", _migration_leaderboard_indexes),
+    (7, "score histograms", _migration_score_histogram),
+    (8, "played_ts and daily/weekly rollups", _migration_played_ts),
+    (9, "question content hashes", _migration_question_hashes),
+    (10, "backfill rollups", _migration_backfill_rollups),
+    (11, "full-text search and near-duplicate index", _migration_question_search),
+    (12, "per-question and per-player answer counters", _migration_answer_stats),
+    (13, "per-player seen-question sets", _migration_user_seen),
+    (14, "spaced-repetition review queue", _migration_review_queue),
+    (15, "all-time top results kept across archiving", _migration_archived_top),
+    (16, "review answers kept out of results", _migration_review_answers),
+    (17, "results_version counter", _migration_results_version),
+    (18, "windowed leaderboard index", _migration_windowed_leaderboard_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Применить недостающие миграции. Возвращает итоговую версию схемы.
+
+    Каждый шаг выполняется в своей транзакции вместе с записью PRAGMA user_version,
+    поэтому прерванная миграция не оставляет базу в промежуточном состоянии,
+    а следующий запуск продолжит с того же шага. В режиме WAL читатели
+    работают и во время построения индексов.
+    """
+    if conn.in_transaction:
         conn.commit()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Схема базы (v{version}) новее, чем поддерживает приложение (v{SCHEMA_VERSION})")
+
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        print(f"[INFO] Applying migration {step_version}: {description}")
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {step_version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = step_version
+    return version
+
+
+def init_database(db_path: Path) -> None:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = get_connection(db_path)
+    cur = conn.cursor()
+
+    try:
+        migrate(conn)
+
+        cur.execute("SELECT EXISTS (SELECT 1 FROM questions)")
+        if cur.fetchone()[0]:
+            print("[INFO] Questions table not empty, seeding skipped.")
+            return
+
+        seed_file = db_path.parent / "seed_questions.csv"
+
+        if not seed_file.exists():
+            print(f"[WARNING] The file {seed_file} was not found. Question loading will be skipped.")
+            return
+
+        report = import_questions(conn, seed_file)
+        print(f"[INFO] Seeded {report['inserted']} questions from {seed_file} "
+              f"({report['rows_per_sec']:.0f} rows/sec)")
+        _print_near_duplicates(report)
+        _print_import_errors(report)
         print("[INFO] Database initialized")
 
     except Exception as e:
@@ -113,3 +1138,101 @@ def init_database(db_path: Path) -> None:
         raise
     finally:
         conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Инициализация и обслуживание базы Quiz Game")
+    parser.add_argument("db", type=Path, nargs="?", default=DEFAULT_DB_PATH)
+    parser.add_argument("--rebuild-stats", action="store_true",
+                        help="пересчитать сводные таблицы по results (с --archive — вместе с архивом)")
+    parser.add_argument("--backfill-history", action="store_true",
+                        help="собрать по истории ответов просмотренные вопросы, очередь повторения и LSH-индекс")
+    parser.add_argument("--import-csv", type=Path, metavar="CSV",
+                        help="добавить вопросы из CSV массовым импортом")
+    parser.add_argument("--sync-csv", type=Path, metavar="CSV",
+                        help="инкрементально применить пакет вопросов (новые — добавить, изменённые — обновить)")
+    parser.add_argument("--retire-missing", action="store_true",
+                        help="с --sync-csv: убрать вопросы категорий пакета, которых в нём нет")
+    parser.add_argument("--rescore", action="store_true",
+                        help="пересчитать очки игр по ответам текущими правилами и сводные таблицы (с --archive — и архив)")
+    parser.add_argument("--archive", type=Path, help="файл архивной базы для старых результатов")
+    parser.add_argument("--older-than", type=int, metavar="DAYS",
+                        help="перенести в --archive игры старше DAYS дней")
+    args = parser.parse_args()
+
+    init_database(args.db)
+
+    if args.import_csv is not None:
+        conn = get_connection(args.db)
+        try:
+            report = import_questions(conn, args.import_csv)
+        finally:
+            conn.close()
+        print(f"[INFO] Imported {report['inserted']} questions in {report['elapsed_sec']} s "
+              f"({report['rows_per_sec']:.0f} rows/sec)")
+        _print_near_duplicates(report)
+        _print_import_errors(report)
+
+    if args.sync_csv is not None:
+        conn = get_connection(args.db)
+        try:
+            report = sync_questions(conn, args.sync_csv, args.retire_missing)
+        finally:
+            conn.close()
+        print(f"[INFO] Synced {args.sync_csv} in {report['elapsed_sec']} s: {report['inserted']} inserted, "
+              f"{report['updated']} updated, {report['unchanged']} unchanged, {report['retired']} retired")
+        _print_near_duplicates(report)
+        _print_import_errors(report)
+
+    if args.older_than is not None:
+        if args.archive is None:
+            parser.error("--older-than требует --archive")
+        archive_results(args.db, args.archive, args.older_than)
+
+    if args.rescore:
+        conn = get_connection(args.db)
+        try:
+            started = time.perf_counter()
+            include_archive = args.archive is not None and args.archive.exists()
+            if include_archive:
+                conn.execute("ATTACH DATABASE ? AS archive", (str(args.archive),))
+            conn.execute("BEGIN")
+            games, changed = rescore_results(conn)
+            if include_archive:
+                archive_games, archive_changed = rescore_results(conn, "archive")
+                games += archive_games
+                changed += archive_changed
+            _rebuild_result_rollups(conn, include_archive)
+            if include_archive:
+                _rebuild_archived_top(conn)
+            conn.commit()
+            print(f"[INFO] Rescored {games} games in {time.perf_counter() - started:.2f} s: {changed} changed")
+        finally:
+            conn.close()
+
+    if args.rebuild_stats:
+        conn = get_connection(args.db)
+        try:
+            include_archive = args.archive is not None and args.archive.exists()
+            if include_archive:
+                conn.execute("ATTACH DATABASE ? AS archive", (str(args.archive),))
+            rebuild_stats(conn, include_archive)
+            conn.commit()
+            print("[INFO] Stats rebuilt")
+        finally:
+            conn.close()
+
+    if args.backfill_history:
+        conn = get_connection(args.db)
+        try:
+            started = time.perf_counter()
+            conn.execute("BEGIN")
+            backfill_history(conn)
+            conn.commit()
+            print(f"[INFO] History backfilled in {time.perf_counter() - started:.2f} s")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Воспроизвести записанные игровые сессии на базе и сравнить задержки и результаты.
+
+Журнал пишет приложение (data/sessions.log) или scripts/bot_driver.py --record.
+Результаты игр записываются в базу, поэтому прогон лучше делать на копии:
+    cp data/app.db /tmp/replay.db
+    python scripts/replay_sessions.py data/sessions.log --db /tmp/replay.db --json bench_results/replay.json
+
+Результаты ссылаются на users, поэтому игроки журнала должны быть в базе.
+Тех, кого нет (боты bot_driver.py создаются в той базе, где шёл прогон),
+replay_sessions создаёт с теми же id и именем replay<id>; их число — в отчёте.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from quiz import QuizGame
+from replay import replay_sessions
+from scripts.init_db import DEFAULT_DB_PATH, init_database
+from seen import get_seen_store
+from selection import get_adaptive_selector
+from user import UserProfile
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Воспроизведение журнала игровых сессий")
+    parser.add_argument("log", type=Path, help="журнал сессий")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH)
+    parser.add_argument("--limit", type=int, help="проиграть только первые N сессий")
+    parser.add_argument("--no-save", action="store_true", help="не записывать результаты игр в базу")
+    parser.add_argument("--plain", action="store_true",
+                        help="равномерный выбор вопросов без адаптивного подбора и учёта виденных (как без main.py)")
+    parser.add_argument("--json", type=Path, metavar="PATH", help="сохранить отчёт в JSON")
+    args = parser.parse_args()
+
+    init_database(args.db)
+    if args.plain:
+        game = QuizGame(args.db)
+    else:
+        # Как в main.py: адаптивный выбор без повторов виденных
+        game = QuizGame(args.db, None, get_adaptive_selector(args.db), get_seen_store(args.db))
+    report = replay_sessions(args.db, args.log, game, UserProfile(args.db), save=not args.no_save, limit=args.limit)
+
+    print(f"[INFO] Replayed {report['sessions']} sessions in {report['elapsed_sec']} s "
+          f"({report['sessions_per_sec']} sessions/sec)")
+    for name, stats in report["latency"].items():
+        if stats:
+            print(f"[INFO] {name:6} median {stats['median_us']} us, p95 {stats['p95_us']} us ({stats['repeat']} calls)")
+    if report["created_users"]:
+        print(f"[INFO] Created {report['created_users']} players missing from {args.db}")
+    if report["diverged_questions"]:
+        print(f"[WARNING] {report['diverged_questions']} sessions got different questions (replayed with recorded ones)")
+    if report["score_mismatches"]:
+        print(f"[WARNING] {report['score_mismatches']} sessions scored differently than recorded")
+
+    if args.json is not None:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"[INFO] Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
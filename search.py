@@ -0,0 +1,139 @@
+"""Поиск по банку вопросов: полнотекстовый (FTS5) и поиск почти одинаковых вопросов.
+
+Почти-дубликаты ищутся через MinHash с одной перестановкой и LSH:
+текст нормализуется и режется на символьные шинглы, каждый шингл хэшируется
+один раз и попадает в одну из LSH_BANDS * LSH_ROWS корзин, в корзине остаётся
+минимальный хэш. Полосы по LSH_ROWS значений хэшируются в ключи таблицы
+question_lsh — кандидаты находятся по индексу, без просмотра банка, а затем
+проверяются точным коэффициентом Жаккара.
+"""
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+import re
+import zlib
+
+from db import get_manager
+from quiz import QUESTION_COLUMNS, Question, _question_from_row
+
+SHINGLE_SIZE = 4
+LSH_BANDS = 8
+LSH_ROWS = 4
+# Порог по умолчанию: при нём вопрос попадает в кандидаты с вероятностью ~0.9
+DUPLICATE_THRESHOLD = 0.7
+# Сколько кандидатов брать из одной LSH-корзины (защита от «популярных» корзин)
+MAX_BUCKET_CANDIDATES = 20
+
+_BINS = LSH_BANDS * LSH_ROWS
+_EMPTY = 1 << 32
+_KEY_BASE = 0x9E3779B97F4A7C15
+_KEY_MOD = (1 << 61) - 1
+# Запрос кандидатов одним выражением на все полосы (по числу полос)
+_CANDIDATES_SQL: Dict[int, str] = {}
+_NON_WORD = re.compile(r"\W+")
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """Символьные шинглы текста без учёта регистра, пунктуации и лишних пробелов."""
+    normalized = " " + _NON_WORD.sub(" ", text.lower()).strip() + " "
+    if len(normalized) <= SHINGLE_SIZE:
+        return frozenset((normalized,))
+    return frozenset(normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    common = len(a & b)
+    total = len(a) + len(b) - common
+    return common / total if total else 1.0
+
+
+def lsh_buckets(text_shingles: Iterable[str]) -> List[int]:
+    """LSH-ключи (по одному на полосу) сигнатуры MinHash набора шинглов."""
+    signature = [_EMPTY] * _BINS
+    for h in map(zlib.crc32, map(str.encode, text_shingles)):
+        b = h % _BINS
+        v = h // _BINS
+        if v < signature[b]:
+            signature[b] = v
+    # Уплотнение: пустая корзина берёт значение следующей непустой
+    if _EMPTY in signature and min(signature) != _EMPTY:
+        for i in range(_BINS):
+            j = i
+            while signature[j % _BINS] == _EMPTY:
+                j += 1
+            if j != i:
+                signature[i] = signature[j % _BINS] + (j - i) * _EMPTY
+    # Ключ полосы — полиномиальный хэш её значений по модулю 2**61 - 1
+    # (не hash(): он не обязан совпадать между версиями Python, а ключи хранятся в базе)
+    buckets = []
+    for band in range(LSH_BANDS):
+        key = band + 1
+        for v in signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]:
+            key = (key * _KEY_BASE + v) % _KEY_MOD
+        buckets.append(key)
+    return buckets
+
+
+def _fts_query(query: str) -> str:
+    """Запрос пользователя → выражение FTS5: все слова обязательны, последнее — по префиксу."""
+    words = _WORD.findall(query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_questions(db_path: Path, query: str, category: Optional[str] = None,
+                     limit: int = 20) -> List[Question]:
+    """Вопросы, в тексте или вариантах которых есть все слова запроса, по релевантности (bm25)."""
+    match = _fts_query(query)
+    if not match:
+        return []
+    columns = ", ".join(f"q.{column.strip()}" for column in QUESTION_COLUMNS.split(","))
+    sql = f"""
+        SELECT {columns}
+        FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid
+        WHERE questions_fts MATCH ?"""
+    params: list = [match]
+    if category is not None:
+        sql += " AND q.category = ?"
+        params.append(category)
+    sql += " ORDER BY questions_fts.rank LIMIT ?"
+    params.append(limit)
+    cur = get_manager(db_path).connection().execute(sql, params)
+    return [_question_from_row(row) for row in cur]
+
+
+def similar_candidates(conn, buckets: Sequence[int]) -> List[int]:
+    """id вопросов, совпавших с сигнатурой хотя бы в одной полосе."""
+    sql = _CANDIDATES_SQL.get(len(buckets))
+    if sql is None:
+        sql = _CANDIDATES_SQL[len(buckets)] = " UNION ALL ".join(
+            [f"SELECT * FROM (SELECT question_id FROM question_lsh WHERE bucket = ? LIMIT {MAX_BUCKET_CANDIDATES})"]
+            * len(buckets))
+    return list(dict.fromkeys(row[0] for row in conn.execute(sql, buckets)))
+
+
+def find_similar(db_path: Path, text: str, threshold: float = DUPLICATE_THRESHOLD,
+                 limit: int = 10) -> List[Tuple[Question, float]]:
+    """Вопросы банка, похожие на text (Жаккар по шинглам >= threshold), сначала самые похожие.
+
+    Находятся вопросы, добавленные через import_questions/sync_questions или
+    проиндексированные миграцией; вставленные в обход них попадут в индекс
+    при следующем импорте.
+    """
+    conn = get_manager(db_path).connection()
+    text_shingles = shingles(text)
+    candidates = similar_candidates(conn, lsh_buckets(text_shingles))
+    if not candidates:
+        return []
+    placeholders = ", ".join("?" * len(candidates))
+    cur = conn.execute(f"SELECT {QUESTION_COLUMNS} FROM questions WHERE id IN ({placeholders})", candidates)
+    similar = []
+    for row in cur:
+        similarity = jaccard(text_shingles, shingles(row[2]))
+        if similarity >= threshold:
+            similar.append((_question_from_row(row), similarity))
+    similar.sort(key=lambda item: (-item[1], item[0].id))
+    return similar[:limit]
@@ -0,0 +1,279 @@
+"""Какие вопросы игрок уже видел: компактные множества id по образцу roaring bitmap.
+
+Id вопроса делится на номер блока (старшие биты) и смещение в блоке (младшие
+CHUNK_BITS бит). Блок с небольшим числом id хранится отсортированным массивом
+uint16, а при ARRAY_LIMIT и больше — битовой картой на 2**CHUNK_BITS бит.
+В базе (user_seen) каждый блок — одна строка (user_id, category, chunk, bits);
+вид блока определяется по длине: ровно BITMAP_BYTES — битовая карта, иначе массив.
+Проверка «видел ли» — O(1) для карты и O(log 4096) для массива, независимо
+от длины истории игрока.
+"""
+from array import array
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+import random
+import sqlite3
+import sys
+import threading
+
+from db import SharedRegistry, get_manager
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+BITMAP_BYTES = (1 << CHUNK_BITS) // 8
+# С этого числа id массив (2 байта на id) не меньше битовой карты
+ARRAY_LIMIT = BITMAP_BYTES // 2
+
+# Попыток выборки с отказами на один вопрос (хватает, пока не увидено ~95% категории)
+REJECTION_ATTEMPTS = 32
+
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+Container = Union[array, bytearray]
+
+
+class SeenSet:
+    """Множество id вопросов из блоков-контейнеров (массив или битовая карта)."""
+
+    __slots__ = ("_chunks", "_size", "_dirty")
+
+    def __init__(self):
+        self._chunks: Dict[int, Container] = {}
+        self._size = 0
+        # Блоки, изменённые после загрузки (пишутся в базу только они)
+        self._dirty: set = set()
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[int, bytes]]) -> "SeenSet":
+        seen = cls()
+        for chunk, bits in rows:
+            if len(bits) == BITMAP_BYTES:
+                container: Container = bytearray(bits)
+                seen._size += sum(bin(byte).count("1") for byte in container if byte)
+            else:
+                container = array("H", bits)
+                if not _NATIVE_LITTLE_ENDIAN:
+                    container.byteswap()
+                seen._size += len(container)
+            seen._chunks[chunk] = container
+        return seen
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, question_id: int) -> bool:
+        container = self._chunks.get(question_id >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = question_id & CHUNK_MASK
+        if isinstance(container, bytearray):
+            return bool(container[low >> 3] & (1 << (low & 7)))
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+
+    def add(self, question_id: int) -> bool:
+        """Добавить id. False — если он уже был."""
+        chunk = question_id >> CHUNK_BITS
+        low = question_id & CHUNK_MASK
+        container = self._chunks.get(chunk)
+        if container is None:
+            container = self._chunks[chunk] = array("H")
+        if isinstance(container, bytearray):
+            mask = 1 << (low & 7)
+            if container[low >> 3] & mask:
+                return False
+            container[low >> 3] |= mask
+        else:
+            i = bisect_left(container, low)
+            if i < len(container) and container[i] == low:
+                return False
+            if len(container) + 1 >= ARRAY_LIMIT:
+                bitmap = bytearray(BITMAP_BYTES)
+                for value in container:
+                    bitmap[value >> 3] |= 1 << (value & 7)
+                bitmap[low >> 3] |= 1 << (low & 7)
+                self._chunks[chunk] = bitmap
+            else:
+                insort(container, low)
+        self._size += 1
+        self._dirty.add(chunk)
+        return True
+
+    def discard(self, question_id: int) -> bool:
+        """Убрать id. False — если его не было. Опустевший блок удаляется."""
+        chunk = question_id >> CHUNK_BITS
+        container = self._chunks.get(chunk)
+        if container is None:
+            return False
+        low = question_id & CHUNK_MASK
+        if isinstance(container, bytearray):
+            mask = 1 << (low & 7)
+            if not container[low >> 3] & mask:
+                return False
+            container[low >> 3] &= ~mask & 0xFF
+            empty = not any(container)
+        else:
+            i = bisect_left(container, low)
+            if i == len(container) or container[i] != low:
+                return False
+            del container[i]
+            empty = not container
+        if empty:
+            del self._chunks[chunk]
+        self._size -= 1
+        self._dirty.add(chunk)
+        return True
+
+    def chunk_bits(self, chunk: int) -> bytes:
+        """Блок в формате таблицы user_seen."""
+        container = self._chunks[chunk]
+        if isinstance(container, bytearray):
+            return bytes(container)
+        if _NATIVE_LITTLE_ENDIAN:
+            return container.tobytes()
+        swapped = array("H", container)
+        swapped.byteswap()
+        return swapped.tobytes()
+
+    def take_dirty(self) -> List[int]:
+        dirty = sorted(self._dirty)
+        self._dirty.clear()
+        return dirty
+
+
+def sample_unseen(ids: Sequence[int], seen: SeenSet, count: int, rng=random) -> List[int]:
+    """До count разных id из ids, которых нет в seen.
+
+    Сначала выборка с отказами: пока игрок видел долю f категории, на вопрос
+    в среднем уходит 1 / (1 - f) попыток. Если за REJECTION_ATTEMPTS попыток
+    на вопрос набрать не удалось (категория почти пройдена) — один проход по ids.
+    """
+    picked: Dict[int, None] = {}
+    for _ in range(count * REJECTION_ATTEMPTS):
+        question_id = ids[rng.randrange(len(ids))]
+        if question_id not in seen:
+            picked[question_id] = None
+            if len(picked) == count:
+                return list(picked)
+    unseen = [question_id for question_id in ids if question_id not in seen]
+    return rng.sample(unseen, min(count, len(unseen)))
+
+
+def write_seen(conn: sqlite3.Connection, records) -> None:
+    """Добавить вопросы записанных игр (ResultRow, answers) в user_seen (в открытой транзакции)."""
+    groups: Dict[Tuple[int, str], List[int]] = {}
+    for row, answers in records:
+        if answers:
+            groups.setdefault((row[0], row[1]), []).extend(answer[0] for answer in answers)
+    for (user_id, category), question_ids in groups.items():
+        chunks = sorted({question_id >> CHUNK_BITS for question_id in question_ids})
+        placeholders = ", ".join("?" * len(chunks))
+        seen = SeenSet.from_rows(conn.execute(
+            f"SELECT chunk, bits FROM user_seen WHERE user_id = ? AND category = ? AND chunk IN ({placeholders})",
+            (user_id, category, *chunks)))
+        for question_id in question_ids:
+            seen.add(question_id)
+        conn.executemany(
+            "INSERT OR REPLACE INTO user_seen (user_id, category, chunk, bits) VALUES (?, ?, ?, ?)",
+            [(user_id, category, chunk, seen.chunk_bits(chunk)) for chunk in seen.take_dirty()]
+        )
+
+
+def remove_seen(conn: sqlite3.Connection, category: str, question_ids: Iterable[int]) -> None:
+    """Убрать вопросы категории из user_seen всех игроков (в открытой транзакции).
+
+    Затрагиваются только блоки, в которые попадают question_ids; пустые блоки удаляются.
+    """
+    by_chunk: Dict[int, List[int]] = {}
+    for question_id in set(question_ids):
+        by_chunk.setdefault(question_id >> CHUNK_BITS, []).append(question_id)
+    if not by_chunk:
+        return
+    placeholders = ", ".join("?" * len(by_chunk))
+    keys = conn.execute(
+        f"SELECT user_id, chunk FROM user_seen WHERE category = ? AND chunk IN ({placeholders})",
+        (category, *by_chunk)).fetchall()
+    for user_id, chunk in keys:
+        bits = conn.execute(
+            "SELECT bits FROM user_seen WHERE user_id = ? AND category = ? AND chunk = ?",
+            (user_id, category, chunk)).fetchone()[0]
+        seen = SeenSet.from_rows([(chunk, bits)])
+        if not any([seen.discard(question_id) for question_id in by_chunk[chunk]]):
+            continue
+        if len(seen):
+            conn.execute("UPDATE user_seen SET bits = ? WHERE user_id = ? AND category = ? AND chunk = ?",
+                         (seen.chunk_bits(chunk), user_id, category, chunk))
+        else:
+            conn.execute("DELETE FROM user_seen WHERE user_id = ? AND category = ? AND chunk = ?",
+                         (user_id, category, chunk))
+
+
+class SeenStore:
+    """Множества просмотренных вопросов игроков: LRU в памяти поверх таблицы user_seen.
+
+    Выданные в игре вопросы отмечаются в памяти сразу (mark), в базу попадают
+    вместе с ответами игры (write_seen в user._write_results).
+    """
+
+    def __init__(self, db_path: Path, maxsize: int = 10000):
+        self.db_path = db_path
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._sets: "OrderedDict[Tuple[int, str], SeenSet]" = OrderedDict()
+
+    def get(self, user_id: int, category: str) -> SeenSet:
+        key = (user_id, category)
+        with self._lock:
+            seen = self._sets.get(key)
+            if seen is not None:
+                self._sets.move_to_end(key)
+                return seen
+        cur = get_manager(self.db_path).connection().execute(
+            "SELECT chunk, bits FROM user_seen WHERE user_id = ? AND category = ?", key)
+        loaded = SeenSet.from_rows(cur)
+        with self._lock:
+            seen = self._sets.setdefault(key, loaded)
+            self._sets.move_to_end(key)
+            while len(self._sets) > self.maxsize:
+                self._sets.popitem(last=False)
+            return seen
+
+    def mark(self, user_id: int, category: str, question_ids: Iterable[int]) -> None:
+        seen = self.get(user_id, category)
+        with self._lock:
+            for question_id in question_ids:
+                seen.add(question_id)
+
+    def reset(self, user_id: int, category: str) -> SeenSet:
+        """Начать категорию заново: очистить множество в памяти и в базе."""
+        with get_manager(self.db_path).transaction() as conn:
+            conn.execute("DELETE FROM user_seen WHERE user_id = ? AND category = ?", (user_id, category))
+        with self._lock:
+            seen = self._sets[(user_id, category)] = SeenSet()
+            return seen
+
+    def record(self, records) -> None:
+        """Отметить вопросы записанных игр в уже загруженных множествах."""
+        with self._lock:
+            for row, answers in records:
+                seen = self._sets.get((row[0], row[1]))
+                if seen is not None:
+                    for answer in answers:
+                        seen.add(answer[0])
+
+
+_stores: SharedRegistry[SeenStore] = SharedRegistry(SeenStore)
+
+
+def get_seen_store(db_path: Path) -> SeenStore:
+    """Общий SeenStore для базы."""
+    return _stores.get(db_path)
+
+
+def record_seen(db_path: Path, records) -> None:
+    """Передать записанные игры SeenStore базы, если он создан."""
+    store = _stores.peek(db_path)
+    if store is not None:
+        store.record(records)
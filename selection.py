@@ -0,0 +1,258 @@
+"""Адаптивный выбор вопросов: вес вопроса зависит от его сложности и умения игрока.
+
+Сложность вопроса — доля верных ответов на него (question_stats), умение игрока —
+доля его верных ответов в категории (user_skill); обе со сглаживанием Лапласа.
+Игроки делятся на SKILL_LEVELS уровней, и для каждой категории и уровня
+строится дерево Фенвика весов вопросов. Выбор вопроса — спуск по дереву
+за O(log n), новые ответы меняют веса точечно, тоже за O(log n) на уровень.
+"""
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Container, Dict, List, Optional, Sequence
+import math
+import random
+import threading
+
+from db import SharedRegistry, VersionCounter
+from seen import REJECTION_ATTEMPTS
+
+SKILL_LEVELS = 5
+# Доля верных ответов, на которую рассчитан подбор: слабым — полегче, сильным — посложнее
+TARGET_EASE = tuple(1 - 0.8 * (level + 0.5) / SKILL_LEVELS for level in range(SKILL_LEVELS))
+# Ширина колокола вокруг целевой сложности и минимальный вес (любой вопрос остаётся достижим)
+EASE_WIDTH = 0.15
+MIN_WEIGHT = 0.05
+# Веса считаются по сложности, округлённой до 1/EASE_STEPS: таблица вместо exp на каждый вопрос
+EASE_STEPS = 100
+
+_WEIGHTS = tuple(
+    tuple(max(MIN_WEIGHT, math.exp(-0.5 * ((step / EASE_STEPS - target) / EASE_WIDTH) ** 2))
+          for step in range(EASE_STEPS + 1))
+    for target in TARGET_EASE
+)
+
+
+def _ease_step(attempts: int, correct: int) -> int:
+    return round((correct + 1) / (attempts + 2) * EASE_STEPS)
+
+
+def skill_level(attempts: int, correct: int) -> int:
+    """Уровень игрока по его ответам в категории (без ответов — средний)."""
+    skill = (correct + 1) / (attempts + 2)
+    return min(int(skill * SKILL_LEVELS), SKILL_LEVELS - 1)
+
+
+class FenwickTree:
+    """Дерево Фенвика над весами: изменение веса и поиск по префиксной сумме за O(log n)."""
+
+    __slots__ = ("_tree", "_size", "_top")
+
+    def __init__(self, weights: Sequence[float]):
+        self._size = n = len(weights)
+        tree = array("d", [0.0])
+        tree.extend(weights)
+        # Построение за O(n): каждый узел добавляет свою сумму родителю
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, index: int, delta: float) -> None:
+        tree, n = self._tree, self._size
+        i = index + 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def total(self) -> float:
+        tree = self._tree
+        i, total = self._size, 0.0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, value: float) -> int:
+        """Индекс элемента, на который приходится префиксная сумма value (0 <= value < total)."""
+        tree, n = self._tree, self._size
+        position = 0
+        step = self._top
+        while step:
+            candidate = position + step
+            if candidate <= n and tree[candidate] <= value:
+                position = candidate
+                value -= tree[candidate]
+            step >>= 1
+        # Погрешность float у самого края: не выходим за последний элемент
+        return min(position, n - 1)
+
+
+class _CategoryWeights:
+    """Вопросы категории (id по возрастанию), их счётчики и деревья весов по уровням."""
+
+    __slots__ = ("ids", "attempts", "correct", "trees")
+
+    def __init__(self, rows):
+        self.ids = array("q")
+        self.attempts = array("l")
+        self.correct = array("l")
+        for question_id, attempts, correct in rows:
+            self.ids.append(question_id)
+            self.attempts.append(attempts)
+            self.correct.append(correct)
+        steps = [_ease_step(a, c) for a, c in zip(self.attempts, self.correct)]
+        self.trees = [FenwickTree([weights[step] for step in steps]) for weights in _WEIGHTS]
+
+    def position(self, question_id: int) -> Optional[int]:
+        i = bisect_left(self.ids, question_id)
+        if i < len(self.ids) and self.ids[i] == question_id:
+            return i
+        return None
+
+    def record(self, position: int, is_correct: int) -> None:
+        old_step = _ease_step(self.attempts[position], self.correct[position])
+        self.attempts[position] += 1
+        self.correct[position] += is_correct
+        new_step = _ease_step(self.attempts[position], self.correct[position])
+        if new_step != old_step:
+            for weights, tree in zip(_WEIGHTS, self.trees):
+                tree.add(position, weights[new_step] - weights[old_step])
+
+    def weight(self, level: int, position: int) -> float:
+        return _WEIGHTS[level][_ease_step(self.attempts[position], self.correct[position])]
+
+
+class AdaptiveSelector:
+    """Взвешенный выбор вопросов категории под уровень игрока.
+
+    Деревья категории строятся при первом обращении одним запросом по индексу
+    категории и дальше обновляются ответами, записанными в этом процессе
+    (user._commit_results → record_answers). При изменении таблицы questions
+    (bank_version) деревья строятся заново.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._bank = VersionCounter(db_path)
+        self._categories: Dict[str, _CategoryWeights] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            self._bank.close()
+
+    def _validate(self) -> None:
+        """Сбросить деревья, если изменились вопросы. Вызывать под self._lock."""
+        if self._bank.changed():
+            self._categories.clear()
+
+    def _category(self, category: str) -> _CategoryWeights:
+        weights = self._categories.get(category)
+        if weights is None:
+            cur = self._bank.connection().execute("""
+                SELECT q.id, COALESCE(s.attempts, 0), COALESCE(s.correct, 0)
+                FROM questions q LEFT JOIN question_stats s ON s.question_id = q.id
+                WHERE q.category = ?
+                ORDER BY q.id""", (category,))
+            weights = self._categories[category] = _CategoryWeights(cur)
+        return weights
+
+    def player_level(self, user_id: Optional[int], category: str) -> int:
+        if user_id is None:
+            return skill_level(0, 0)
+        row = self._bank.connection().execute(
+            "SELECT attempts, correct FROM user_skill WHERE user_id = ? AND category = ?",
+            (user_id, category)).fetchone()
+        return skill_level(*row) if row else skill_level(0, 0)
+
+    def sample(self, category: str, count: int, user_id: Optional[int] = None,
+               rng: Optional[random.Random] = None, exclude: Optional[Container[int]] = None) -> List[int]:
+        """count разных вопросов категории с вероятностью, пропорциональной весу.
+
+        Выбранный вопрос временно убирается из дерева (вес вычитается) и
+        возвращается после выбора: O(count * log n). Вопросы из exclude
+        (например, уже виденные игроком, seen.SeenSet) отбрасываются так же;
+        после count * REJECTION_ATTEMPTS отброшенных (категория почти пройдена)
+        остальные выбираются одним проходом по категории. Вопросов может
+        вернуться меньше count.
+        """
+        rng = rng or random
+        with self._lock:
+            self._validate()
+            weights = self._category(category)
+            if len(weights.ids) <= count:
+                selected = [i for i in weights.ids if exclude is None or i not in exclude]
+                rng.shuffle(selected)
+                return selected
+
+            level = self.player_level(user_id, category)
+            tree = weights.trees[level]
+            total = tree.total()
+            taken = []
+            selected = []
+            rejected = 0
+            try:
+                while len(selected) < count and len(taken) < len(weights.ids):
+                    if rejected >= count * REJECTION_ATTEMPTS:
+                        selected.extend(self._scan(weights, level, taken, count - len(selected), rng, exclude))
+                        break
+                    position = tree.find(rng.random() * total)
+                    weight = weights.weight(level, position)
+                    tree.add(position, -weight)
+                    total -= weight
+                    taken.append((position, weight))
+                    question_id = weights.ids[position]
+                    if exclude is None or question_id not in exclude:
+                        selected.append(question_id)
+                    else:
+                        rejected += 1
+            finally:
+                for position, weight in taken:
+                    tree.add(position, weight)
+            return selected
+
+    @staticmethod
+    def _scan(weights: "_CategoryWeights", level: int, taken, count: int, rng, exclude) -> List[int]:
+        """До count вопросов не из exclude и не из taken — один проход, с вероятностью по весу.
+
+        Взвешенная выборка без возвращения по ключам rng.random() ** (1 / вес).
+        """
+        drawn = {position for position, _ in taken}
+        keyed = [(rng.random() ** (1 / weights.weight(level, position)), question_id)
+                 for position, question_id in enumerate(weights.ids)
+                 if position not in drawn and question_id not in exclude]
+        keyed.sort(reverse=True)
+        return [question_id for _, question_id in keyed[:count]]
+
+    def record(self, category: str, answers) -> None:
+        """Учесть ответы (question_id, selected_index, is_correct, time) в весах категории."""
+        with self._lock:
+            weights = self._categories.get(category)
+            if weights is None:
+                return
+            for question_id, _, is_correct, _ in answers:
+                position = weights.position(question_id)
+                if position is not None:
+                    weights.record(position, is_correct)
+
+
+_selectors: SharedRegistry[AdaptiveSelector] = SharedRegistry(AdaptiveSelector)
+
+
+def get_adaptive_selector(db_path: Path) -> AdaptiveSelector:
+    """Общий AdaptiveSelector для базы."""
+    return _selectors.get(db_path)
+
+
+def record_answers(db_path: Path, records) -> None:
+    """Передать записанные игры (ResultRow, answers) селектору базы, если он создан."""
+    selector = _selectors.peek(db_path)
+    if selector is not None:
+        for row, answers in records:
+            selector.record(row[1], answers)
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+import threading
+import time
+import uuid
+
+from quiz import QuizGame, QuestionBank, QuestionCache, Question
+
+DEFAULT_TTL_SECONDS = 30 * 60
+
+
+class GameSession:
+    """Отдельная игра одного игрока внутри общего процесса."""
+
+    __slots__ = ("session_id", "user_id", "game", "last_active", "lock")
+
+    def __init__(self, session_id: str, user_id: Optional[int], game: QuizGame):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.game = game
+        self.last_active = time.monotonic()
+        # Один игрок может прислать два ответа одновременно — игру защищаем отдельно
+        self.lock = threading.Lock()
+
+    def start_game(self, category: str, questions_count: int = 10) -> None:
+        with self.lock:
+            self.game.start_game(category, questions_count, self.user_id)
+
+    def start_review(self, questions_count: int = 10) -> None:
+        with self.lock:
+            self.game.start_review(self.user_id, questions_count)
+
+    def get_next_question(self) -> Optional[Question]:
+        with self.lock:
+            return self.game.get_next_question()
+
+    def check_answer(self, question_id: int, selected_index: int, time_spent_sec: float) -> bool:
+        with self.lock:
+            return self.game.check_answer(question_id, selected_index, time_spent_sec)
+
+
+class SessionManager:
+    """Реестр игровых сессий: создание, поиск по id и удаление устаревших.
+
+    Все сессии используют один источник вопросов (QuestionBank или QuestionCache),
+    поэтому на сессию приходится только состояние игры и ссылки на общие вопросы.
+    selector (selection.AdaptiveSelector) включает адаптивный выбор вопросов во всех сессиях,
+    seen (seen.SeenStore) — выбор без повторов уже виденных игроком вопросов.
+    Сессии хранятся в OrderedDict в порядке последнего обращения, так что
+    expire() просматривает только устаревшие записи в начале словаря.
+    """
+
+    def __init__(self, db_path: Path, bank: Optional[Union[QuestionBank, QuestionCache]] = None,
+                 ttl_sec: float = DEFAULT_TTL_SECONDS, max_sessions: Optional[int] = None,
+                 selector=None, seen=None):
+        self.db_path = db_path
+        self.bank = bank if bank is not None else QuestionBank.load(db_path)
+        self.selector = selector
+        self.seen = seen
+        self.ttl_sec = ttl_sec
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def list_categories(self) -> List[str]:
+        return self.bank.list_categories()
+
+    def create(self, user_id: Optional[int] = None) -> GameSession:
+        """Создать новую сессию с уникальным id."""
+        with self._lock:
+            self._expire_locked(time.monotonic())
+            if self.max_sessions is not None and len(self._sessions) >= self.max_sessions:
+                raise RuntimeError(f"Достигнут лимит активных сессий: {self.max_sessions}")
+
+            session_id = uuid.uuid4().hex
+            session = GameSession(session_id, user_id, QuizGame(self.db_path, self.bank, self.selector, self.seen))
+            self._sessions[session_id] = session
+            return session
+
+    def get(self, session_id: str) -> Optional[GameSession]:
+        """Найти активную сессию и продлить её жизнь. None — если нет или истекла."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_active > self.ttl_sec:
+                del self._sessions[session_id]
+                return None
+            session.last_active = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Удалить сессии без активности дольше ttl_sec. Возвращает число удалённых."""
+        with self._lock:
+            return self._expire_locked(time.monotonic() if now is None else now)
+
+    def _expire_locked(self, now: float) -> int:
+        removed = 0
+        sessions = self._sessions
+        while sessions:
+            session_id, session = next(iter(sessions.items()))
+            if now - session.last_active <= self.ttl_sec:
+                break
+            del sessions[session_id]
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"active_sessions": len(self._sessions)}
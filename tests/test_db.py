@@ -0,0 +1,12 @@
+from db import close_all_managers
+from quiz import get_question_cache
+from scripts.init_db import init_database
+
+
+def test_question_cache_survives_close_all(tmp_path):
+    db_path = tmp_path / "app.db"
+    init_database(db_path)
+    cache = get_question_cache(db_path)
+    assert cache.list_categories() == []
+    close_all_managers()
+    assert cache.list_categories() == []
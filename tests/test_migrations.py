@@ -0,0 +1,43 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from scripts.init_db import SCHEMA_VERSION, migrate
+
+APP_DB = Path(__file__).resolve().parent.parent / "data" / "app.db"
+
+
+def _counts(conn, tables):
+    return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+
+@pytest.mark.skipif(not APP_DB.exists(), reason="нет data/app.db")
+def test_migrate_copy_of_app_db(tmp_path, capsys):
+    db_path = tmp_path / "app.db"
+    shutil.copyfile(APP_DB, db_path)
+    conn = sqlite3.connect(db_path)
+    tables = ("users", "results", "questions")
+    before = _counts(conn, tables)
+
+    assert migrate(conn) == SCHEMA_VERSION
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert _counts(conn, tables) == before
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    for table in ("bank_version", "results_version"):
+        assert conn.execute(f"SELECT version FROM {table} WHERE id = 1").fetchone() is not None
+
+    # Повторный запуск ничего не применяет
+    capsys.readouterr()
+    assert migrate(conn) == SCHEMA_VERSION
+    assert "Applying migration" not in capsys.readouterr().out
+    conn.close()
+
+
+def test_migrate_refuses_newer_schema(tmp_path):
+    conn = sqlite3.connect(tmp_path / "app.db")
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    conn.close()
@@ -0,0 +1,87 @@
+import csv
+import sqlite3
+
+from scripts.init_db import QUESTION_CSV_HEADER, init_database, sync_questions
+from seen import ARRAY_LIMIT, BITMAP_BYTES, SeenSet, write_seen
+
+CHUNK = 1 << 16
+
+
+def test_discard_offset_zero_keeps_chunk():
+    seen = SeenSet()
+    for question_id in (CHUNK, CHUNK + 1, CHUNK + 2):
+        seen.add(question_id)
+    assert seen.discard(CHUNK + 1)
+    assert seen.discard(CHUNK + 2)
+    assert len(seen) == 1
+    assert CHUNK in seen
+    assert seen.chunk_bits(1) == b"\x00\x00"
+    assert seen.discard(CHUNK)
+    assert len(seen) == 0
+    assert not seen.discard(CHUNK)
+
+
+def test_retire_keeps_seen_offset_zero(tmp_path):
+    db_path = tmp_path / "app.db"
+    init_database(db_path)
+    conn = sqlite3.connect(db_path)
+    questions = [(CHUNK + i, "c", f"q{i}", "a", "b", "c", "d", 0) for i in range(3)]
+    conn.executemany("""INSERT INTO questions (id, category, text, option1, option2, option3, option4, correct_index)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", questions)
+    user_id = conn.execute("INSERT INTO users (name) VALUES ('u')").lastrowid
+    write_seen(conn, [((user_id, "c"), [(question_id,) for question_id, *_ in questions])])
+    conn.commit()
+
+    pack = tmp_path / "pack.csv"
+    with open(pack, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(QUESTION_CSV_HEADER)
+        writer.writerow(questions[0][1:])
+    report = sync_questions(conn, pack, retire_missing=True)
+
+    assert report["retired"] == 2
+    rows = conn.execute("SELECT chunk, bits FROM user_seen WHERE user_id = ? AND category = 'c'", (user_id,))
+    seen = SeenSet.from_rows(rows)
+    assert len(seen) == 1 and CHUNK in seen
+    conn.close()
+
+
+def test_array_chunk_round_trip_with_offset_zero():
+    seen = SeenSet()
+    ids = [0, 5, CHUNK, CHUNK + 7, 3 * CHUNK + 65535]
+    for question_id in reversed(ids):
+        assert seen.add(question_id)
+    assert not seen.add(0)
+    assert len(seen) == len(ids)
+    assert seen.take_dirty() == [0, 1, 3]
+    assert seen.take_dirty() == []
+
+    restored = SeenSet.from_rows((chunk, seen.chunk_bits(chunk)) for chunk in (0, 1, 3))
+    assert len(restored) == len(ids)
+    assert all(question_id in restored for question_id in ids)
+    assert 1 not in restored and 2 * CHUNK not in restored
+    assert restored.chunk_bits(0) == seen.chunk_bits(0)
+
+
+def test_array_switches_to_bitmap_and_round_trips():
+    seen = SeenSet()
+    ids = list(range(0, 2 * ARRAY_LIMIT, 2))
+    for question_id in ids[:ARRAY_LIMIT - 2]:
+        seen.add(question_id)
+    assert len(seen.chunk_bits(0)) == 2 * (ARRAY_LIMIT - 2)
+    for question_id in ids[ARRAY_LIMIT - 2:]:
+        seen.add(question_id)
+    bits = seen.chunk_bits(0)
+    assert len(bits) == BITMAP_BYTES
+    assert len(seen) == len(ids)
+
+    restored = SeenSet.from_rows([(0, bits)])
+    assert len(restored) == len(ids)
+    assert 0 in restored and ids[-1] in restored and 1 not in restored
+
+    # Из битовой карты: блок остаётся, пока в нём есть хоть один id (включая 0)
+    for question_id in ids[1:]:
+        assert restored.discard(question_id)
+    assert len(restored) == 1 and 0 in restored
+    assert restored.discard(0)
+    assert len(restored) == 0 and 0 not in restored
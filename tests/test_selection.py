@@ -0,0 +1,39 @@
+import random
+
+from selection import FenwickTree
+
+
+def _linear_find(weights, value):
+    for index, weight in enumerate(weights):
+        if value < weight:
+            return index
+        value -= weight
+    return len(weights) - 1
+
+
+def test_fenwick_find_matches_prefix_sums():
+    rng = random.Random(7)
+    for size in (1, 2, 3, 8, 13, 64, 100):
+        weights = [rng.choice([0.0, 0.5, 1.0, 2.0, 3.0]) for _ in range(size)]
+        weights[rng.randrange(size)] = 1.0
+        tree = FenwickTree(weights)
+        assert len(tree) == size
+        assert tree.total() == sum(weights)
+        boundaries = [0.0]
+        for weight in weights:
+            boundaries.append(boundaries[-1] + weight)
+        for value in boundaries[:-1] + [rng.uniform(0, tree.total()) for _ in range(50)]:
+            if value < tree.total():
+                assert tree.find(value) == _linear_find(weights, value)
+
+
+def test_fenwick_find_after_add():
+    weights = [1.0, 1.0, 1.0, 1.0, 1.0]
+    tree = FenwickTree(weights)
+    tree.add(2, -1.0)
+    weights[2] = 0.0
+    tree.add(4, 2.0)
+    weights[4] = 3.0
+    assert tree.total() == 6.0
+    assert [tree.find(value) for value in (0.0, 1.5, 2.0, 2.5, 3.0, 5.999)] == [0, 1, 3, 3, 4, 4]
+    assert tree.find(tree.total() - 1e-12) == 4
@@ -0,0 +1,76 @@
+"""Выполнение работы с базой вне главного цикла Tk.
+
+Tk можно трогать только из главного потока, поэтому задачи идут в пул
+потоков, а их результаты — в очередь, которую главный поток разбирает
+через after(). Опрос очереди запланирован, только пока есть незавершённые
+задачи, так что в простое цикл Tk ничем не занят.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import queue
+import traceback
+
+# Как часто главный поток проверяет готовые результаты, мс
+POLL_MS = 15
+
+
+def _print_error(error: BaseException) -> None:
+    print(f"[ERROR] Background task failed: {error}")
+    traceback.print_exception(type(error), error, error.__traceback__)
+
+
+class TkExecutor:
+    """Пул потоков для блокирующих вызовов; колбэки результатов вызываются в потоке Tk."""
+
+    def __init__(self, widget, workers: int = 2, poll_ms: int = POLL_MS):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quiz-db")
+        self._done: "queue.SimpleQueue" = queue.SimpleQueue()
+        # Меняются только в главном потоке
+        self._pending = 0
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, fn: Callable[..., Any], *args,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None) -> Future:
+        """Выполнить fn(*args) в пуле; on_done(result) или on_error(exc) — в главном потоке."""
+        future = self._pool.submit(fn, *args)
+        self._pending += 1
+        future.add_done_callback(lambda f: self._done.put((f, on_done, on_error or _print_error)))
+        if self._poll_id is None:
+            self._poll_id = self.widget.after(self.poll_ms, self._poll)
+        return future
+
+    def _poll(self) -> None:
+        self._poll_id = None
+        while True:
+            try:
+                future, on_done, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if self._closed:
+                continue
+            error = future.exception()
+            try:
+                if error is not None:
+                    on_error(error)
+                elif on_done is not None:
+                    on_done(future.result())
+            except Exception as e:
+                _print_error(e)
+        if self._pending > 0 and not self._closed:
+            self._poll_id = self.widget.after(self.poll_ms, self._poll)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Дождаться начатых задач (колбэки уже не вызываются) и остановить пул."""
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        self._pool.shutdown(wait=wait)
@@ -13,6 +13,8 @@ class QuizUI(tk.Tk):
         self.total_seconds = 0
         self._categories: List[str] = []
         self.current_question_id = None
+        # Номер текущего экрана: фоновый результат (tk_executor) рисуется, только если экран не сменился
+        self.screen_id = 0
 
     def _disable_options(self):
         """Отключает все кнопки вариантов ответов"""
@@ -102,7 +104,8 @@ class QuizUI(tk.Tk):
                      on_time_up: Callable[[int, int], None],
                      on_open_profile: Callable[[], None],
                      on_update_profile: Callable[[str, Optional[str]], None],
-                     on_back_to_menu: Callable[[], None]
+                     on_back_to_menu: Callable[[], None],
+                     on_start_review: Optional[Callable[[], None]] = None
                      ) -> None:
         self.on_start_game = on_start_game
         self.on_answer = on_answer
@@ -110,14 +113,25 @@ class QuizUI(tk.Tk):
         self.on_open_profile = on_open_profile
         self.on_update_profile = on_update_profile
         self.on_back_to_menu = on_back_to_menu
+        self.on_start_review = on_start_review
 
     def set_categories(self, categories: List[str]) -> None:
         """Устанавливает список доступных категорий"""
         self._categories = categories or []
 
 
+    def show_loading(self, text: str = "Загрузка...") -> int:
+        """Экран-заглушка на время работы с базой. Возвращает его screen_id."""
+        self._cancel_timer_if_any()
+        self.screen_id += 1
+        for widget in self.winfo_children():
+            widget.destroy()
+        tk.Label(self, text=text, font=("Arial", 16)).pack(pady=200)
+        return self.screen_id
+
     def show_main_menu(self):
         self._cancel_timer_if_any()
+        self.screen_id += 1
         # Очищаем окно от предыдущих виджетов
         for widget in self.winfo_children():
             widget.destroy()
@@ -130,6 +144,11 @@ class QuizUI(tk.Tk):
                                  width=20, height=2)
         start_button.pack(pady=10)
 
+        # Повторение ошибок — если режим подключён
+        if getattr(self, "on_start_review", None) is not None:
+            review_button = tk.Button(self, text="Повторение", command=self.on_start_review, width=20, height=2)
+            review_button.pack(pady=10)
+
         profile_button = tk.Button(self, text="Профиль", command=self.on_open_profile, width=20, height=2)
         profile_button.pack(pady=10)
 
@@ -139,6 +158,7 @@ class QuizUI(tk.Tk):
 
     def show_category_menu(self, categories: List[str]):
         self._cancel_timer_if_any()
+        self.screen_id += 1
         """
         Отображает меню выбора категории с кнопками для каждой категории
 
@@ -211,6 +231,7 @@ class QuizUI(tk.Tk):
             """
         # Очищаем окно от предыдущих виджетов
         self._cancel_timer_if_any()
+        self.screen_id += 1
         for widget in self.winfo_children():
             widget.destroy()
         self.current_question_id = question.id
@@ -280,6 +301,7 @@ class QuizUI(tk.Tk):
     def show_result(self, score: int):
         """Показывает экран с результатами игры"""
         self._cancel_timer_if_any()
+        self.screen_id += 1
 
         # Очищаем окно
         for widget in self.winfo_children():
@@ -346,6 +368,7 @@ class QuizUI(tk.Tk):
     def show_profile(self, profile_data: dict, stats: dict):
         """Показывает экран профиля с статистикой"""
         self._cancel_timer_if_any()
+        self.screen_id += 1
 
         # Очищаем окно
         for widget in self.winfo_children():
@@ -355,6 +378,7 @@ class QuizUI(tk.Tk):
         games_played = stats.get("games_played", stats.get("total_games", 0))
         best_score = stats.get("best_score", 0)
         avg_score = stats.get("avg_score", stats.get("average_score", 0.0))
+        best_percentile = stats.get("best_percentile")
         by_category = stats.get("by_category", [])
 
         # Защита: преобразуем dict в list если нужно
@@ -437,6 +461,8 @@ class QuizUI(tk.Tk):
             ("Лучший счет", best_score),
             ("Средний счет", f"{avg_score:.2f}")
         ]
+        if best_percentile is not None:
+            stat_rows.append(("Лучший счет выше, чем в", f"{best_percentile:.0f}% игр"))
 
         for i, (label, value) in enumerate(stat_rows):
             tk.Label(stats_grid, text=label + ":", font=("Arial", 11, "bold")).grid(row=i, column=0, sticky="w", pady=2)
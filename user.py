@@ -1,41 +1,473 @@
 from pathlib import Path
-from typing import Optional, Dict, Any
-from scripts.init_db import get_connection
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+from db import SECONDS_PER_DAY, SharedRegistry, VersionCounter, get_manager
+from review import REVIEW_CATEGORY, write_review_answers, write_reviews
+from seen import record_seen, write_seen
+from selection import record_answers
+import atexit
+import bisect
+import queue
 import sqlite3
+import threading
+import time
 from datetime import datetime
 
+# Ширина корзины гистограммы очков (score_histogram) и ключ гистограммы по всем категориям
+SCORE_BUCKET = 10
+ALL_CATEGORIES = "*"
+# Размер досок Leaderboard; столько же лучших игр каждой категории хранит archived_top
+LEADERBOARD_K = 100
+
+# (user_id, category, score, duration_sec, played_at, played_ts)
+ResultRow = Tuple[int, str, int, int, str, int]
+# (question_id, selected_index или None при таймауте, is_correct, time_spent_sec) — см. QuizGame.answers
+AnswerRow = Tuple[int, Optional[int], int, float]
+# Результат игры вместе с её ответами
+GameRecord = Tuple[ResultRow, Sequence[AnswerRow]]
+
+
+def _write_results(conn: sqlite3.Connection, records: List[GameRecord]) -> None:
+    """Записать результаты игр в открытой транзакции (общий путь для прямой и фоновой записи).
+
+    В той же транзакции пишутся:
+    - ответы игр (answers, одним executemany);
+    - счётчики ответов question_stats / user_skill для адаптивного выбора (selection.py);
+    - множества виденных вопросов user_seen (seen.py) и очередь повторения review_queue (review.py);
+    - сводки user_stats / user_category_stats, score_histogram и results_daily / results_weekly,
+      из которых get_stats, get_percentile и get_period_stats читают без обращения к results.
+
+    Игры-повторения (REVIEW_CATEGORY) пишутся только в review_answers и очередь повторения.
+    """
+    reviews = [record for record in records if record[0][1] == REVIEW_CATEGORY]
+    if reviews:
+        write_review_answers(conn, reviews)
+        records = _ranked(records)
+    rows = [row for row, _ in records]
+    answer_rows = []
+    question_counts: Dict[int, List[int]] = {}
+    skill_rows = []
+    for row, answers in records:
+        cur = conn.execute(
+            '''INSERT INTO results (user_id, category, score, duration_sec, played_at, played_ts)
+            VALUES (?, ?, ?, ?, ?, ?)''',
+            row
+        )
+        result_id = cur.lastrowid
+        answer_rows.extend(
+            (result_id, row[0], question_id, selected_index, is_correct, time_spent_sec)
+            for question_id, selected_index, is_correct, time_spent_sec in answers
+        )
+        correct = 0
+        for question_id, _, is_correct, _ in answers:
+            counts = question_counts.get(question_id)
+            if counts is None:
+                counts = question_counts[question_id] = [0, 0]
+            counts[0] += 1
+            counts[1] += is_correct
+            correct += is_correct
+        if answers:
+            skill_rows.append((row[0], row[1], len(answers), correct))
+    if answer_rows:
+        conn.executemany(
+            '''INSERT INTO answers (result_id, user_id, question_id, selected_index, is_correct, time_spent_sec)
+            VALUES (?, ?, ?, ?, ?, ?)''',
+            answer_rows
+        )
+        conn.executemany(
+            '''INSERT INTO question_stats (question_id, attempts, correct) VALUES (?, ?, ?)
+            ON CONFLICT (question_id) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                correct = correct + excluded.correct''',
+            [(question_id, attempts, correct) for question_id, (attempts, correct) in question_counts.items()]
+        )
+        conn.executemany(
+            '''INSERT INTO user_skill (user_id, category, attempts, correct) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, category) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                correct = correct + excluded.correct''',
+            skill_rows
+        )
+        write_seen(conn, records)
+        write_reviews(conn, records)
+    conn.executemany(
+        '''INSERT INTO user_stats (user_id, games, total_score, best_score)
+        VALUES (?, 1, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            games = games + 1,
+            total_score = total_score + excluded.total_score,
+            best_score = MAX(best_score, excluded.best_score)''',
+        [(row[0], row[2], row[2]) for row in rows]
+    )
+    conn.executemany(
+        '''INSERT INTO user_category_stats (user_id, category, games, total_score, best_score)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT (user_id, category) DO UPDATE SET
+            games = games + 1,
+            total_score = total_score + excluded.total_score,
+            best_score = MAX(best_score, excluded.best_score)''',
+        [(row[0], row[1], row[2], row[2]) for row in rows]
+    )
+    histogram = [(row[1], row[2] // SCORE_BUCKET) for row in rows]
+    histogram += [(ALL_CATEGORIES, bucket) for _, bucket in histogram]
+    conn.executemany(
+        '''INSERT INTO score_histogram (category, bucket, games) VALUES (?, ?, 1)
+        ON CONFLICT (category, bucket) DO UPDATE SET games = games + 1''',
+        histogram
+    )
+    for table, period in (("results_daily", "day"), ("results_weekly", "week")):
+        conn.executemany(
+            f'''INSERT INTO {table} ({period}, user_id, category, games, total_score, best_score)
+            VALUES (?, ?, ?, 1, ?, ?)
+            ON CONFLICT ({period}, user_id, category) DO UPDATE SET
+                games = games + 1,
+                total_score = total_score + excluded.total_score,
+                best_score = MAX(best_score, excluded.best_score)''',
+            [(_period(row[5], period), row[0], row[1], row[2], row[2]) for row in rows]
+        )
+
+
+def _ranked(records: List[GameRecord]) -> List[GameRecord]:
+    """Игры, которые идут в results и рейтинги (все, кроме повторений)."""
+    return [record for record in records if record[0][1] != REVIEW_CATEGORY]
+
+
+def _period(played_ts: int, period: str) -> int:
+    """Номер дня (UTC) или недели с понедельника для сводок results_daily / results_weekly."""
+    day = played_ts // SECONDS_PER_DAY
+    return day if period == "day" else (day + 3) // 7
+
+
+def _percentile(conn: sqlite3.Connection, score: int, category: str = ALL_CATEGORIES) -> Optional[float]:
+    """Доля игр (в %) с меньшим счётом по гистограмме; внутри корзины — линейная интерполяция.
+
+    Читает не больше max_score / SCORE_BUCKET строк, независимо от размера results.
+    None — если в категории ещё нет игр.
+    """
+    bucket = score // SCORE_BUCKET
+    total = below = in_bucket = 0
+    for row_bucket, games in conn.execute(
+            'SELECT bucket, games FROM score_histogram WHERE category = ?', (category,)):
+        total += games
+        if row_bucket < bucket:
+            below += games
+        elif row_bucket == bucket:
+            in_bucket = games
+    if not total:
+        return None
+    below += in_bucket * (score - bucket * SCORE_BUCKET) / SCORE_BUCKET
+    return round(100.0 * below / total, 1)
+
+
+def _commit_results(db_path: Path, records: List[GameRecord]) -> None:
+    """Записать пачку игр одной транзакцией и обновить структуры в памяти."""
+    with get_manager(db_path).transaction() as conn:
+        _write_results(conn, records)
+    records = _ranked(records)
+    leaderboard = _leaderboards.peek(db_path)
+    if leaderboard is not None:
+        leaderboard.add([row for row, _ in records])
+    record_answers(db_path, records)
+    record_seen(db_path, records)
+
+
+# (-score, played_at, user_id): по возрастанию кортежа — лучшие результаты первыми
+_LeaderEntry = Tuple[int, str, int]
+
+
+class Leaderboard:
+    """Top-K результатов (общий и по категориям) в памяти.
+
+    Доска категории загружается один раз запросом по покрывающему индексу
+    (ORDER BY score DESC LIMIT k без сортировки), дальше обновляется
+    каждой записанной игрой за O(log k). Общий для процесса экземпляр
+    на базу — get_leaderboard_cache(). Изменения results из других процессов
+    (init_db.py --rescore, --rebuild-stats, --archive) увеличивают счётчик
+    results_version — по нему доски сбрасываются при следующем top().
+    """
+
+    ALL = None  # ключ общей доски
+
+    def __init__(self, db_path: Path, k: int = LEADERBOARD_K):
+        self.db_path = db_path
+        self.k = k
+        self._boards: Dict[Optional[str], List[_LeaderEntry]] = {}
+        # Доски, которые сейчас читаются из базы: игры, записанные за время чтения
+        self._loading: Dict[Optional[str], List[_LeaderEntry]] = {}
+        # Меняется при invalidate(): загрузка, начатая до сброса, не сохраняется
+        self._generation = 0
+        self._results = VersionCounter(db_path, "results_version")
+        self._lock = threading.Lock()
+
+    def top(self, category: Optional[str] = None, limit: int = 10) -> List[_LeaderEntry]:
+        if limit > self.k:
+            return _query_top(get_manager(self.db_path).connection(), category, limit, None)
+        with self._lock:
+            if self._results.changed():
+                self._reset()
+            board = self._boards.get(category)
+            if board is not None:
+                return board[:limit]
+            # Загружает доску один поток; остальные пока читают базу напрямую
+            loader = category not in self._loading
+            if loader:
+                self._loading[category] = []
+            generation = self._generation
+        board = _query_top(get_manager(self.db_path).connection(), category, self.k, None)
+        if not loader:
+            return board[:limit]
+        with self._lock:
+            pending = self._loading.pop(category, None)
+            if pending is None or generation != self._generation:
+                return board[:limit]
+            # Игры, записанные во время чтения: часть из них уже попала в выборку
+            for entry in pending:
+                self._insert(board, entry)
+            self._boards[category] = board
+            return board[:limit]
+
+    def add(self, rows: Sequence[ResultRow]) -> None:
+        with self._lock:
+            for user_id, category, score, _, played_at, _ in rows:
+                entry = (-score, played_at, user_id)
+                for key in (self.ALL, category):
+                    board = self._boards.get(key)
+                    if board is not None:
+                        self._insert(board, entry)
+                    elif key in self._loading:
+                        self._loading[key].append(entry)
+                    # Иначе доска ещё не загружалась — прочитается из базы с этой игрой
+
+    def _insert(self, board: List[_LeaderEntry], entry: _LeaderEntry) -> None:
+        """Вставить результат в отсортированную доску (без повторов), оставив не больше k."""
+        i = bisect.bisect_left(board, entry)
+        if i < len(board) and board[i] == entry:
+            return
+        if len(board) < self.k or i < len(board):
+            board.insert(i, entry)
+            if len(board) > self.k:
+                board.pop()
+
+    def invalidate(self) -> None:
+        """Сбросить доски (например, после записи results в обход UserProfile)."""
+        with self._lock:
+            self._reset()
+
+    def _reset(self) -> None:
+        """Вызывать под self._lock."""
+        self._boards.clear()
+        self._loading.clear()
+        self._generation += 1
+
+
+def _query_top(conn: sqlite3.Connection, category: Optional[str], limit: int,
+               since: Optional[int]) -> List[_LeaderEntry]:
+    """Top по покрывающим индексам results и archived_top, слитый в Python.
+
+    archived_top — лучшие игры, перенесённые в архив (init_db.archive_results):
+    по LEADERBOARD_K на категорию и на все категории, так что доски «за всё время»
+    длиной до LEADERBOARD_K точны и после архивации.
+    since (секунды Unix) — окно по played_ts: results читается диапазоном
+    индекса (category, played_ts, ...) и сортирует только игры окна.
+    """
+    entries = []
+    for table, played_ts in (("results", "played_ts"),
+                             ("archived_top", "CAST(strftime('%s', played_at, 'utc') AS INTEGER)")):
+        where = []
+        params: List[Any] = []
+        if category is not None:
+            where.append("category = ?")
+            params.append(category)
+        if since is not None:
+            # В archived_top не больше LEADERBOARD_K строк на категорию — выражение дёшево
+            where.append(f"{played_ts} >= ?")
+            params.append(since)
+        condition = " WHERE " + " AND ".join(where) if where else ""
+        params.append(limit)
+        sql = f"SELECT score, played_at, user_id FROM {table}{condition} ORDER BY score DESC, played_at LIMIT ?"
+        entries.extend((-score, played_at, user_id) for score, played_at, user_id in conn.execute(sql, params))
+    entries.sort()
+    return entries[:limit]
+
+
+_leaderboards: SharedRegistry[Leaderboard] = SharedRegistry(Leaderboard)
+
+
+def get_leaderboard_cache(db_path: Path) -> Leaderboard:
+    return _leaderboards.get(db_path)
+
+
+class _Flush:
+    """Маркер в очереди: записать накопленное и сообщить об этом."""
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class ResultWriter:
+    """Фоновая запись результатов пачками (group commit).
+
+    save_result кладёт строку в очередь и сразу возвращается. Поток-писатель
+    коммитит пачку, когда набралось batch_size строк или прошло flush_interval_sec
+    с первой строки пачки — один fsync на пачку вместо одного на игру.
+    Очередь ограничена max_queue: при переполнении submit ждёт (backpressure),
+    а если задан put_timeout — бросает queue.Full. При выходе из процесса
+    close() дописывает всё, что осталось в очереди.
+
+    Пачка, которую не удалось записать за RETRY_ATTEMPTS попыток, не теряется:
+    писатель держит её и повторяет раз в RETRY_INTERVAL_SEC и вместе со следующей
+    пачкой. Пока она не записана, submit, flush и close бросают RuntimeError
+    (last_error — исходная ошибка).
+    """
+
+    RETRY_ATTEMPTS = 3
+    RETRY_DELAY_SEC = 0.05
+    RETRY_INTERVAL_SEC = 1.0
+
+    def __init__(self, db_path: Path, batch_size: int = 500, flush_interval_sec: float = 0.05,
+                 max_queue: int = 10_000, put_timeout: Optional[float] = None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.put_timeout = put_timeout
+        self.last_error: Optional[Exception] = None
+        # Записи, которые не удалось закоммитить (только поток-писатель)
+        self._failed: List[GameRecord] = []
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: GameRecord) -> None:
+        if self._closed:
+            raise RuntimeError("ResultWriter уже закрыт")
+        self._raise_if_failed()
+        self._queue.put(record, timeout=self.put_timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Дождаться записи всего, что отправлено до вызова. False — если не успели за timeout."""
+        if self._closed:
+            self._raise_if_failed()
+            return True
+        marker = _Flush()
+        self._queue.put(marker)
+        if not marker.done.wait(timeout):
+            return False
+        self._raise_if_failed()
+        return True
+
+    def close(self) -> None:
+        """Записать остаток очереди и остановить поток (идемпотентно)."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._raise_if_failed()
+
+    def _raise_if_failed(self) -> None:
+        error = self.last_error
+        if error is not None:
+            raise RuntimeError(f"Не записано результатов: {len(self._failed)} ({error})") from error
+
+    def _write(self, batch: List[GameRecord]) -> None:
+        """Закоммитить batch вместе с ранее не записанными; при неудаче — сохранить их для повтора."""
+        records = self._failed + batch
+        delay = self.RETRY_DELAY_SEC
+        for attempt in range(self.RETRY_ATTEMPTS):
+            try:
+                _commit_results(self.db_path, records)
+            except Exception as e:
+                error = e
+                if attempt + 1 < self.RETRY_ATTEMPTS:
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+            self._failed = []
+            self.last_error = None
+            return
+        self._failed = records
+        self.last_error = error
+        print(f"[ERROR] Failed to write {len(records)} results, will retry: {error}")
+
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.RETRY_INTERVAL_SEC if self._failed else None)
+            except queue.Empty:
+                self._write([])
+                continue
+            batch: List[GameRecord] = []
+            markers: List[_Flush] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval_sec
+
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, _Flush):
+                    markers.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if stop:
+                # Дописываем то, что успели положить после маркера остановки
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(item, _Flush):
+                        markers.append(item)
+                    elif item is not _STOP:
+                        batch.append(item)
+            if batch or self._failed:
+                self._write(batch)
+            for marker in markers:
+                marker.done.set()
+            if stop:
+                return
+
 
 class UserProfile:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, writer: Optional[ResultWriter] = None):
         self.db_path = db_path
+        # Постоянное соединение потока вместо connect/close на каждый вызов
+        self._db = get_manager(db_path)
+        # Необязательная фоновая запись результатов пачками
+        self.writer = writer
 
     def create_profile(self, name: str, avatar_path: Optional[Path] = None) -> int:
         if not name.strip():
             raise ValueError("Имя пользователя не может быть пустым")
 
-        conn = get_connection(self.db_path)
-        cursor = conn.cursor()
-
+        avatar_str = str(avatar_path) if avatar_path else None
+        created_at = datetime.now().isoformat()
         try:
-            avatar_str = str(avatar_path) if avatar_path else None
-            created_at = datetime.now().isoformat()
-
-            cursor.execute(
-                'INSERT INTO users (name, avatar_path, created_at) VALUES (?, ?, ?)',
-                (name.strip(), avatar_str, created_at)
-            )
-            user_id = cursor.lastrowid
-            conn.commit()
-            return user_id
-
+            with self._db.transaction() as conn:
+                cursor = conn.execute(
+                    'INSERT INTO users (name, avatar_path, created_at) VALUES (?, ?, ?)',
+                    (name.strip(), avatar_str, created_at)
+                )
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
-            conn.rollback()
             raise ValueError(f"Пользователь с именем '{name}' уже существует")
-        finally:
-            conn.close()
 
     def load_profile(self, user_id: int) -> Dict[str, Any]:
-        conn = get_connection(self.db_path)
+        conn = self._db.connection()
         cursor = conn.cursor()
 
         cursor.execute(
@@ -43,7 +475,6 @@ class UserProfile:
             (user_id,)
         )
         user_data = cursor.fetchone()
-        conn.close()
 
         if not user_data:
             raise ValueError(f"Пользователь с ID {user_id} не найден")
@@ -60,12 +491,11 @@ class UserProfile:
         params = []
 
         # Загружаем текущие данные пользователя
-        conn = get_connection(self.db_path)
+        conn = self._db.connection()
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM users WHERE id = ?", (user_id,))
         result = cursor.fetchone()
         if not result:
-            conn.close()
             raise ValueError(f"Пользователь с ID {user_id} не найден")
         current_name = result[0]
 
@@ -79,17 +509,15 @@ class UserProfile:
             params.append(str(avatar_path))
 
         if not updates:  # нечего обновлять
-            conn.close()
             return
 
         params.append(user_id)
 
         try:
-            query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
-            cursor.execute(query, params)
-            conn.commit()
+            # Транзакция закрывается и при ошибке: соединение потока общее
+            with self._db.transaction() as conn:
+                conn.execute(f"UPDATE users SET {', '.join(updates)} WHERE id = ?", params)
         except sqlite3.IntegrityError:
-            conn.rollback()
             # Проверяем, не пытается ли пользователь установить своё же имя
             if name and name.strip() == current_name:
                 # Это нормально - пользователь не меняет имя
@@ -103,66 +531,99 @@ class UserProfile:
                 else:
                     # Другая ошибка целостности
                     raise ValueError("Ошибка при обновлении профиля")
-        finally:
-            conn.close()
 
-    def save_result(self, user_id: int, score: int, duration_sec: int, category: str) -> None:
-        conn = get_connection(self.db_path)
-        cursor = conn.cursor()
+    def save_result(self, user_id: int, score: int, duration_sec: int, category: str,
+                    answers: Sequence[AnswerRow] = ()) -> None:
+        """Сохранить результат игры и (необязательно) её ответы — одной транзакцией."""
+        now = datetime.now()
+        record = ((user_id, category, score, duration_sec, now.isoformat(), int(now.timestamp())), tuple(answers))
+        if self.writer is not None:
+            self.writer.submit(record)
+            return
+        _commit_results(self.db_path, [record])
 
-        try:
-            played_at = datetime.now().isoformat()
-            cursor.execute(
-                '''INSERT INTO results (user_id, category, score, duration_sec, played_at)
-                VALUES (?, ?, ?, ?, ?)''',
-                (user_id, category, score, duration_sec, played_at)
+    def get_leaderboard(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Лучшие результаты за всё время по всем категориям."""
+        return self._leaderboard_entries(get_leaderboard_cache(self.db_path).top(None, limit))
+
+    def get_category_leaderboard(self, category: str, limit: int = 10,
+                                 since: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Лучшие результаты категории; since — начало окна в секундах Unix (played_ts >= since)."""
+        if since is None:
+            entries = get_leaderboard_cache(self.db_path).top(category, limit)
+        else:
+            # Окно по времени: диапазон индекса (category, played_ts, ...), сортируются только игры окна
+            entries = _query_top(self._db.connection(), category, limit, since)
+        return self._leaderboard_entries(entries)
+
+    def _leaderboard_entries(self, entries: List[_LeaderEntry]) -> List[Dict[str, Any]]:
+        user_ids = sorted({user_id for _, _, user_id in entries})
+        names = {}
+        if user_ids:
+            placeholders = ", ".join("?" * len(user_ids))
+            cur = self._db.connection().execute(
+                f"SELECT id, name FROM users WHERE id IN ({placeholders})", user_ids
             )
-            conn.commit()
-        finally:
-            conn.close()
+            names = dict(cur.fetchall())
+        return [
+            {"rank": rank, "user_id": user_id, "name": names.get(user_id), "score": -neg_score,
+             "played_at": played_at}
+            for rank, (neg_score, played_at, user_id) in enumerate(entries, 1)
+        ]
 
     def get_stats(self, user_id: int) -> Dict[str, Any]:
-        conn = get_connection(self.db_path)
+        conn = self._db.connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as games_played,
-                COALESCE(MAX(score), 0) as best_score,
-                COALESCE(AVG(score), 0.0) as avg_score
-            FROM results 
-            WHERE user_id = ?
-        ''', (user_id,))
+        # Сводные таблицы: чтение по первичному ключу, не зависит от числа игр
+        cursor.execute(
+            'SELECT games, best_score, total_score FROM user_stats WHERE user_id = ?',
+            (user_id,)
+        )
         stats = cursor.fetchone()
 
         cursor.execute('''
-            SELECT 
-                category,
-                COUNT(*) as games,
-                COALESCE(AVG(score), 0.0) as avg_score
-            FROM results 
+            SELECT category, games, total_score
+            FROM user_category_stats
             WHERE user_id = ?
-            GROUP BY category
             ORDER BY category
         ''', (user_id,))
         by_category = [
-            {"category": row[0], "games": row[1], "avg_score": round(float(row[2]), 2)}
+            {"category": row[0], "games": row[1], "avg_score": round(row[2] / row[1], 2) if row[1] else 0.0}
             for row in cursor.fetchall()
         ]
-        conn.close()
 
         return {
             "games_played": stats[0] if stats else 0,
             "best_score": stats[1] if stats else 0,
-            "avg_score": round(float(stats[2]), 2) if stats and stats[2] is not None else 0.0,
+            "avg_score": round(stats[2] / stats[0], 2) if stats and stats[0] else 0.0,
+            # Процент игр, в которых счёт ниже лучшего результата игрока
+            "best_percentile": _percentile(conn, stats[1]) if stats else None,
             "by_category": by_category
         }
 
-    def ensure_default_user(self) -> int:
-        conn = get_connection(self.db_path)
-        cursor = conn.cursor()
+    def get_period_stats(self, user_id: int, days: int = 7) -> Dict[str, Any]:
+        """Статистика игрока за последние days дней (включая сегодняшний) по сводке results_daily."""
+        first_day = int(datetime.now().timestamp()) // SECONDS_PER_DAY - days + 1
+        row = self._db.connection().execute('''
+            SELECT COALESCE(SUM(games), 0), COALESCE(MAX(best_score), 0), COALESCE(SUM(total_score), 0)
+            FROM results_daily
+            WHERE user_id = ? AND day >= ?
+        ''', (user_id, first_day)).fetchone()
+        return {
+            "days": days,
+            "games_played": row[0],
+            "best_score": row[1],
+            "avg_score": round(row[2] / row[0], 2) if row[0] else 0.0,
+        }
 
-        try:
+    def get_percentile(self, score: int, category: Optional[str] = None) -> Optional[float]:
+        """Сколько процентов игр (всех или в категории) набрали меньше score."""
+        return _percentile(self._db.connection(), score, category or ALL_CATEGORIES)
+
+    def ensure_default_user(self) -> int:
+        with self._db.transaction() as conn:
+            cursor = conn.cursor()
             cursor.execute('SELECT id FROM users WHERE name = ?', ('Player1',))
             user = cursor.fetchone()
             if user:
@@ -173,8 +634,4 @@ class UserProfile:
                 'INSERT INTO users (name, created_at) VALUES (?, ?)',
                 ('Player1', created_at)
             )
-            user_id = cursor.lastrowid
-            conn.commit()
-            return user_id
-        finally:
-            conn.close()
+            return cursor.lastrowid